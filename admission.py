@@ -0,0 +1,92 @@
+# admission.py
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import REGISTRY
+
+ADMITTED = REGISTRY.counter("admission_admitted_total", "Requests that got an execution slot", ("endpoint",))
+QUEUED = REGISTRY.counter("admission_queued_total", "Requests that had to wait for a slot", ("endpoint",))
+SHED = REGISTRY.counter("admission_shed_total", "Requests rejected by admission control", ("endpoint", "reason"))
+BYPASSED = REGISTRY.counter("admission_bypassed_total", "Cache hits served without taking a slot", ("endpoint",))
+WAIT_SECONDS = REGISTRY.histogram("admission_wait_seconds", "Time spent queued before admission", ("endpoint",))
+
+
+class Overloaded(Exception):
+    """No slot for this request - answer `status` with a Retry-After header instead of queueing forever."""
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """
+    At most `max_concurrent` requests run at once; up to `max_queue` more
+    wait, each for at most `queue_timeout` seconds. Anything beyond that is
+    shed straight away:
+
+    - queue full        -> Overloaded(429), client should back off
+    - waited too long   -> Overloaded(503), we couldn't serve it in time
+
+    so latency stays bounded by (queue_timeout + service time) instead of
+    growing with the backlog. One limiter per endpoint, per process.
+    """
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            if self.active < self.max_concurrent and not self.waiting:
+                self.active += 1
+                ADMITTED.inc(self.name)
+                return
+            if self.waiting >= self.max_queue:
+                SHED.inc(self.name, "queue_full")
+                raise Overloaded(f"{self.name}: too many requests queued", 429, 1)
+            self.waiting += 1
+            QUEUED.inc(self.name)
+            began = time.monotonic()
+            deadline = began + self.queue_timeout
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        SHED.inc(self.name, "deadline")
+                        raise Overloaded(f"{self.name}: no capacity within {self.queue_timeout}s", 503,
+                                         max(1, math.ceil(self.queue_timeout)))
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            ADMITTED.inc(self.name)
+            WAIT_SECONDS.observe(time.monotonic() - began, self.name)
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def admit(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def bypass(self):
+        # Counted only - the request was a cache hit and never needed a slot
+        BYPASSED.inc(self.name)
+
+
+def build_limiters(limits):
+    """{endpoint: (max_concurrent, max_queue, queue_timeout)} -> {endpoint: AdmissionLimiter}"""
+    return {name: AdmissionLimiter(name, *settings) for name, settings in limits.items()}
@@ -1,30 +1,130 @@
+import io
 import json
-from flask import Flask, request, jsonify
+import logging
+import math
+import os
+import random
+import threading
+import time
+from flask import Flask, request, jsonify, g, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
+from sqlalchemy import event, insert, inspect, select, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import selectinload
+import sqlite3
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 
 # Agents ah import pannunga
 from user_profile_agent import UserProfileAgent
 from fund_screener_agent import FundScreenerAgent
 from explainable_ai_agent import ExplainableAIAgent
+from scheme_refresher import SchemeRefresher
+from scheme_snapshot import SCHEMES_FILE, PRIVATE_FUND_FIELDS, PROFILE_RULES, SchemeRecord
+from portfolio_cache import PortfolioResponseCache
+from password_hasher import PasswordHasher, HasherBusy
+from metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE
+from admission import Overloaded, build_limiters
+from portfolio_projection import (PortfolioProjector, normalize_holdings,
+                                  DEFAULT_YEARS, DEFAULT_PATHS, MAX_YEARS, MAX_PATHS)
 
 # --- 1. SETUP ---
 app = Flask(__name__)
 CORS(app) 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///site.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+def in_memory_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def engine_options(uri):
+    # Pool sized for threaded gunicorn workers; WAL lets readers run alongside the writer.
+    # File-backed SQLite only: in-memory SQLite gets a StaticPool (no pool_size), other
+    # databases don't take sqlite3's connect_args - both keep SQLAlchemy's defaults
+    if make_url(uri).get_backend_name() != 'sqlite' or in_memory_sqlite(uri):
+        return {}
+    return {
+        'pool_size': 10,
+        'max_overflow': 10,
+        'pool_recycle': 3600,
+        'connect_args': {'timeout': 15, 'check_same_thread': False},
+    }
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['JWT_SECRET_KEY'] = 'THIS_IS_A_VERY_SECRET_KEY_12345'
+app.config['SCHEME_POLL_SECONDS'] = 30 # scheme file mtime check
+app.config['SCHEME_RELABEL_SECONDS'] = 0 # >0 runs run_ai_labeling_job in the background
+# Password hashing - read from the environment, applied when the hasher is first used (get_password_hasher)
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12)) # cost factor; old hashes are upgraded on next login
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2)) # dedicated bcrypt processes
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 8)) # queued + running; more than this -> 503
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5)) # seconds
+app.config['PORTFOLIO_BATCH_MAX'] = 500 # portfolios per /save_portfolios call
+app.config['PORTFOLIO_PAGE_MAX'] = 100 # page size cap for GET /portfolios
+app.config['GENERATE_BATCH_MAX'] = 10000 # quiz payloads per JSON-array /generate_portfolios call (NDJSON input is unbounded)
+app.config['GENERATE_BATCH_CHUNK'] = 256 # NDJSON lines per write
+app.config['PORTFOLIO_LOG_SAMPLE_RATE'] = 0.0 # fraction of /generate_portfolio requests logged with stage timings
+# Admission control, per worker process: endpoint -> (max running, max queued, seconds a queued request may wait).
+# Cache hits never take a slot; past the queue -> 429, past the wait -> 503, both with Retry-After.
+# Sized from the worker's request threads (gunicorn.conf.py reads the same variable): an endpoint may hold
+# at most half of them, running + queued, so cheap requests always find a thread and the queue can fill
+WORKER_THREADS = int(os.environ.get('GUNICORN_THREADS', 4))
+ADMISSION_RUNNING = max(1, WORKER_THREADS // 4)
+ADMISSION_QUEUED = max(0, WORKER_THREADS // 2 - ADMISSION_RUNNING)
+app.config['ADMISSION_LIMITS'] = {
+    'generate_portfolio': (ADMISSION_RUNNING, ADMISSION_QUEUED, 2.0), # cache misses (table build after a swap)
+    'generate_portfolios': (ADMISSION_RUNNING, ADMISSION_QUEUED, 5.0), # a stream holds its slot until the last line
+    'projection': (ADMISSION_RUNNING, ADMISSION_QUEUED, 2.0), # uncached Monte Carlo runs, single portfolio
+    'projection_batch': (1, ADMISSION_QUEUED, 5.0), # /portfolios/projections
+}
 db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
 jwt = JWTManager(app)
+# Monte Carlo projections; results cached per (snapshot, holdings, options)
+projector = PortfolioProjector()
+limiters = build_limiters(app.config['ADMISSION_LIMITS'])
 
 # --- Global variables ---
 # SCHEMES_DATA inga thevai illai, ScreenerAgent kulla load pannuthu
 profile_agent = None
 screener_agent = None
 explainer_agent = None
+scheme_refresher = None
+response_cache = None
+_initialized = False # create_app() done
+password_hasher = None # bcrypt process pool, see get_password_hasher()
+_hasher_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+# --- Metrics (GET /metrics) ---
+REQUEST_SECONDS = REGISTRY.histogram("http_request_seconds", "Request latency per endpoint", ("endpoint", "method"))
+REQUESTS = REGISTRY.counter("http_requests_total", "Responses per endpoint and status", ("endpoint", "status"))
+BATCH_ITEMS = REGISTRY.counter("portfolio_batch_items_total", "Quiz payloads answered by /generate_portfolios", ("status",))
+STAGE_SECONDS = REGISTRY.histogram(
+    "portfolio_stage_seconds",
+    "/generate_portfolio time per stage (screener/allocation/explainer/serialization run at cache build)",
+    ("stage",))
+REGISTRY.gauge("scheme_snapshot_age_seconds", "Seconds since the live scheme snapshot was loaded",
+               lambda: time.time() - screener_agent.snapshot.loaded_at if screener_agent else None)
+REGISTRY.gauge("scheme_snapshot_schemes", "Schemes in the live snapshot",
+               lambda: len(screener_agent.snapshot) if screener_agent else None)
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # Per-connection SQLite settings for many concurrent workers
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL") # readers don't block the writer
+    cursor.execute("PRAGMA synchronous=NORMAL") # safe with WAL, far fewer fsyncs
+    cursor.execute("PRAGMA busy_timeout=5000") # wait for the write lock instead of failing
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA cache_size=-16000") # ~16 MB page cache
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
 
 # --- 2. DATABASE MODELS ---
 class User(db.Model):
@@ -36,25 +136,186 @@ class User(db.Model):
 class Portfolio(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     profile_name = db.Column(db.String(100), nullable=False)
+    risk_profile = db.Column(db.String(20)) # "Aggressive"... - drives the rebuilt explanations
     allocation = db.Column(db.String(200), nullable=False)
-    schemes = db.Column(db.Text, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Legacy: full fund dicts as JSON. New rows keep it empty and use `holdings`
+    schemes = db.Column(db.Text, nullable=False, default='')
+    # Indexed: per-user listing is an index range scan (SQLite keeps the id/rowid in the index too)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    holdings = db.relationship('Holding', backref='portfolio', lazy=True, order_by='Holding.id',
+                               cascade='all, delete-orphan')
+
+class Scheme(db.Model):
+    # Scheme metadata stored once; holdings point here by ticker
+    ticker = db.Column(db.String(40), primary_key=True)
+    scheme_name = db.Column(db.String(200), nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    risk_label = db.Column(db.String(20))
+    snapshot_version = db.Column(db.String(12)) # snapshot this row was last synced from
+
+class Holding(db.Model):
+    # One fund in a saved portfolio. scheme_ticker is indexed for
+    # "who holds GOLDBEES.NS" style queries.
+    id = db.Column(db.Integer, primary_key=True)
+    portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id', ondelete='CASCADE'), nullable=False, index=True)
+    scheme_ticker = db.Column(db.String(40), db.ForeignKey('scheme.ticker'), nullable=False, index=True)
+    percent = db.Column(db.Float, nullable=False)
+    snapshot_version = db.Column(db.String(12)) # scheme snapshot at save time
+
+# Columns added after a table first shipped: create_all() won't add them to an existing site.db
+ADDED_COLUMNS = {
+    'portfolio': {'risk_profile': 'VARCHAR(20)'},
+}
+
+def init_db():
+    db.create_all()
+    existing = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table_name, columns in ADDED_COLUMNS.items():
+            present = {c['name'] for c in existing.get_columns(table_name)}
+            for column, ddl in columns.items():
+                if column not in present:
+                    connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column} {ddl}"))
+    # create_all() skips existing tables, so add any indexes an older site.db is missing
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
 
 # --- 3. AI AGENTS INITIALIZATION ---
-def init_agents():
-    global profile_agent, screener_agent, explainer_agent
+def encode_json(obj):
+    # Same bytes jsonify() would send
+    with STAGE_SECONDS.time("serialization"):
+        return app.json.response(obj).get_data()
+
+def encode_json_line(obj):
+    # Compact, no trailing newline - one NDJSON record
+    with STAGE_SECONDS.time("serialization"):
+        return app.json.dumps(obj).encode()
+
+def init_agents(schemes_file=SCHEMES_FILE, start_refresher=True):
+    global profile_agent, screener_agent, explainer_agent, scheme_refresher, response_cache
     try:
         profile_agent = UserProfileAgent()
-        screener_agent = FundScreenerAgent() # Data va athuve load pannidum
+        screener_agent = FundScreenerAgent(path=schemes_file) # Data va athuve load pannidum
         explainer_agent = ExplainableAIAgent()
         if not screener_agent.schemes_db: # Check if data loaded
              raise Exception("Scheme data failed to load in FundScreenerAgent.")
-        print("--- Backend API Ready v2.0: Database & 3 Agents Initialized ---")
-    except Exception as e:
-        print(f"FATAL ERROR during Agent Init: {e}")
+        response_cache = PortfolioResponseCache(profile_agent, build_portfolio_response, encode_json, encode_json_line)
+        explainer_agent.warm(screener_agent.snapshot) # Shortlist explanations precomputed
+        response_cache.warm(screener_agent.snapshot) # Eager fill at startup
+        scheme_refresher = SchemeRefresher(
+            screener_agent,
+            path=schemes_file,
+            poll_seconds=app.config['SCHEME_POLL_SECONDS'],
+            relabel_seconds=app.config['SCHEME_RELABEL_SECONDS'],
+        )
+        # New data -> explanations and response table built BEFORE it goes live, off the request path
+        scheme_refresher.before_swap(explainer_agent.warm)
+        scheme_refresher.before_swap(response_cache.warm)
+        if start_refresher:
+            scheme_refresher.start()
+        logger.info("--- Backend API Ready v2.0: Database & 3 Agents Initialized ---")
+    except Exception:
+        logger.exception("FATAL ERROR during Agent Init")
+
+def create_app(schemes_file=SCHEMES_FILE, start_refresher=True):
+    """
+    Loads everything the endpoints need - DB tables, scheme snapshot, agents
+    and the warmed response cache - and returns the app. Runs once; later
+    calls only return the app.
+
+    Under gunicorn (gunicorn.conf.py, preload_app) this runs in the master
+    before fork, so every worker starts with the snapshot and cache already
+    in (shared, copy-on-write) memory; `after_fork` then starts the
+    per-worker background thread.
+    """
+    global _initialized
+    if not _initialized:
+        with app.app_context():
+            init_db()
+            logger.info("Database tables checked/created.")
+            if not in_memory_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+                db.engine.dispose() # no pooled SQLite connections carried over fork()
+            # (an in-memory database IS its one connection - disposing it would drop the tables)
+        init_agents(schemes_file, start_refresher=False)
+        _initialized = is_ready()
+    if start_refresher and scheme_refresher is not None:
+        scheme_refresher.start()
+    return app
+
+def after_fork():
+    # Called in each gunicorn worker. Threads don't survive fork(), so the
+    # refresher is started here; a swap only replaces this worker's snapshot.
+    # Every worker polls the scheme file; with SCHEME_RELABEL_SECONDS only the
+    # one holding the RelabelLock runs the labeling job.
+    if not in_memory_sqlite(app.config['SQLALCHEMY_DATABASE_URI']): # its one connection is the database
+        with app.app_context():
+            db.engine.dispose(close=False) # connections from the parent belong to the parent
+    if scheme_refresher is not None:
+        scheme_refresher.start()
+
+def get_password_hasher():
+    # Built on first use, not at import - so BCRYPT_LOG_ROUNDS etc. set in
+    # app.config before the first signup/login are the ones that apply
+    global password_hasher
+    if password_hasher is None:
+        with _hasher_lock:
+            if password_hasher is None:
+                # bcrypt runs in its own process pool, not on the request thread
+                password_hasher = PasswordHasher(
+                    rounds=app.config['BCRYPT_LOG_ROUNDS'],
+                    workers=app.config['PASSWORD_HASH_WORKERS'],
+                    max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+                    timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+                )
+    return password_hasher
+
+def is_ready():
+    return (screener_agent is not None and response_cache is not None
+            and len(screener_agent.snapshot) > 0)
 
 # --- 4. API ENDPOINTS ---
 
+@app.before_request
+def start_request_timer():
+    g.request_began = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    began = g.pop('request_began', None)
+    if began is not None:
+        endpoint = request.endpoint or "unmatched" # url rule name, never the raw path
+        REQUEST_SECONDS.observe(time.perf_counter() - began, endpoint, request.method)
+        REQUESTS.inc(endpoint, str(response.status_code))
+    return response
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    # Readiness probe: 503 until the scheme snapshot and response cache are loaded
+    if not is_ready():
+        return jsonify({"status": "loading"}), 503
+    snapshot = screener_agent.snapshot
+    return jsonify({"status": "ready", "snapshot": snapshot.version, "schemes": len(snapshot),
+                    "pid": os.getpid()}), 200
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return app.response_class(REGISTRY.render(), mimetype=None, content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(e):
+    # Auth burst - fail fast instead of queueing behind bcrypt
+    response = jsonify({"error": "Server busy, please retry shortly"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    # Shed load up front - a fast 429/503 beats a gunicorn worker timeout
+    response = jsonify({"error": "Server busy, please retry shortly"})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, e.status
+
 @app.route("/signup", methods=["POST"])
 def signup():
     # (No change needed here)
@@ -63,7 +324,7 @@ def signup():
     password = data.get('password')
     user_exists = User.query.filter_by(email=email).first()
     if user_exists: return jsonify({"error": "Email already exists"}), 409
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+    hashed_password = get_password_hasher().hash(password)
     new_user = User(email=email, password_hash=hashed_password)
     db.session.add(new_user)
     db.session.commit()
@@ -76,25 +337,127 @@ def login():
     email = data.get('email')
     password = data.get('password')
     user = User.query.filter_by(email=email).first()
-    if user and bcrypt.check_password_hash(user.password_hash, password):
-        access_token = create_access_token(identity=user.id)
+    hasher = get_password_hasher()
+    if user and hasher.check(user.password_hash, password):
+        if hasher.needs_rehash(user.password_hash):
+            # Cost factor changed - upgrade the stored hash while we have the plain password
+            try:
+                user.password_hash = hasher.hash(password)
+                db.session.commit()
+            except HasherBusy:
+                pass # Next login will try again
+        # JWT "sub" has to be a string (PyJWT rejects int subjects on decode)
+        access_token = create_access_token(identity=str(user.id))
         return jsonify(access_token=access_token), 200
     return jsonify({"error": "Invalid email or password"}), 401
 
 @app.route("/generate_portfolio", methods=["POST"])
 def generate_portfolio_route():
-    print("\n--- New Portfolio Request v2.0 Received ---")
     user_details = request.json
+    # Request mudiyira varaikkum intha snapshot thaan - background swap affect pannathu
+    snapshot = screener_agent.snapshot
+    began = time.perf_counter()
+
+    # Response already encoded in the cache - hit is a dict lookup, no agent calls
+    quiz_key = profile_agent.normalize(user_details)
+    profiled = time.perf_counter()
+    cached = response_cache.peek(quiz_key, snapshot)
+    if cached is not None:
+        limiters['generate_portfolio'].bypass()
+        body, status = cached
+    else:
+        # Table for this snapshot not built yet - that is real work, take a slot
+        with limiters['generate_portfolio'].admit():
+            body, status = response_cache.get(quiz_key, snapshot)
+    done = time.perf_counter()
+    STAGE_SECONDS.observe(profiled - began, "profile")
+    STAGE_SECONDS.observe(done - profiled, "cache_lookup")
+    sample_rate = app.config['PORTFOLIO_LOG_SAMPLE_RATE']
+    if sample_rate and random.random() < sample_rate:
+        logger.info("generate_portfolio quiz=%s snapshot=%s status=%s profile=%.1fus cache_lookup=%.1fus",
+                    quiz_key, snapshot.version, status, (profiled - began) * 1e6, (done - profiled) * 1e6)
+    return app.response_class(body, status=status, mimetype="application/json")
+
+def read_ndjson(stream):
+    # One payload per line, read as it arrives - the body is never held in memory
+    for raw in stream:
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            yield json.loads(raw)
+        except ValueError:
+            yield None
+
+@app.route("/generate_portfolios", methods=["POST"])
+def generate_portfolios_route():
+    """
+    Bulk /generate_portfolio. Body is either a JSON array of quiz payloads
+    (at most GENERATE_BATCH_MAX) or NDJSON (Content-Type application/x-ndjson,
+    one payload per line, any length). Streams back NDJSON in input order:
 
-    # Agents ah use pannunga
-    risk_profile = profile_agent.run(user_details)
-    print(f"[Agent 1 - Profile]: User is '{risk_profile}'")
-    shortlisted_funds = screener_agent.run(risk_profile)
-    print(f"[Agent 2 - Screener]: Found {len(shortlisted_funds)} matching funds for '{risk_profile}'.")
+        {"index": 0, "status": 200, "portfolio": {...same as /generate_portfolio...}}
 
-    if not shortlisted_funds:
-         return jsonify({"error": f"No suitable funds found for profile '{risk_profile}'"}), 404
+    Payloads are collapsed to their (Quiz_Answer_1, Quiz_Answer_2, horizon)
+    key and answered from PortfolioResponseCache, so each distinct profile
+    is built once per snapshot no matter how many clients share it.
+    """
+    if request.mimetype == "application/x-ndjson":
+        # LimitedStream.readline() goes byte by byte; buffer it
+        payloads = read_ndjson(io.BufferedReader(request.stream, 64 * 1024))
+    else:
+        payloads = request.get_json(silent=True)
+        if not isinstance(payloads, list):
+            return jsonify({"error": "Body must be a JSON array of quiz payloads, or NDJSON"}), 400
+        if len(payloads) > app.config['GENERATE_BATCH_MAX']:
+            return jsonify({"error": f"At most {app.config['GENERATE_BATCH_MAX']} payloads per JSON request, "
+                                     "send application/x-ndjson for more"}), 413
+    # Whole batch answered from one snapshot, even if a swap lands mid-stream
+    snapshot = screener_agent.snapshot
+    chunk_size = app.config['GENERATE_BATCH_CHUNK']
+    invalid = app.json.dumps({"error": "Payload must be a JSON object"}).encode()
+    # Even warm, a big stream ties up a worker thread for a while - always take a slot
+    limiter = limiters['generate_portfolios']
+    limiter.acquire()
 
+    def generate():
+        chunk = []
+        statuses = {}
+        for index, payload in enumerate(payloads):
+            if isinstance(payload, dict):
+                body, status = response_cache.get_line(profile_agent.normalize(payload), snapshot)
+            else:
+                body, status = invalid, 400
+            chunk.append(b'{"index":%d,"status":%d,"portfolio":%s}\n' % (index, status, body))
+            statuses[status] = statuses.get(status, 0) + 1
+            if len(chunk) >= chunk_size:
+                yield b"".join(chunk)
+                chunk = []
+        if chunk:
+            yield b"".join(chunk)
+        for status, count in statuses.items():
+            BATCH_ITEMS.inc(str(status), amount=count)
+
+    response = app.response_class(stream_with_context(generate()), mimetype="application/x-ndjson")
+    response.call_on_close(limiter.release) # stream finished, or the client went away
+    return response
+
+def public_fund_view(fund, percent, explanation):
+    if isinstance(fund, SchemeRecord):
+        # Snapshot data - public fields precomputed, only percent/explanation are per request
+        return fund.public_view(percent, explanation)
+    # Plain dict (saved-metadata fallback)
+    view = {k: v for k, v in fund.items() if k not in PRIVATE_FUND_FIELDS}
+    view['explanation'] = explanation
+    view['percent'] = percent
+    return view
+
+def rule_based_allocation(risk_profile, shortlisted_funds, snapshot):
+    """
+    Fixed category split + first matching fund per slot. Only used when the
+    scheme file has no optimizer output (see SchemeSnapshot.allocations).
+    Returns (plan, [{"fund": {...}, "percent": X}, ...]).
+    """
     # --- Puthu, Updated Optimization Logic ---
     final_portfolio_plan = {}
     final_schemes_list = [] # Format: [{"fund": {...}, "percent": X}, ...]
@@ -114,7 +477,7 @@ def generate_portfolio_route():
         fund1 = find_best(['Stock', 'Small-Cap', 'Mid-Cap'], ['High'], shortlisted_funds)
         fund2 = find_best(['Flexi-Cap', 'Large-Cap'], ['High','Medium'], [f for f in shortlisted_funds if f != fund1]) # Avoid duplicate
         fund3 = find_best(['Index Fund'], ['Medium'], shortlisted_funds)
-        fund4 = find_best(['Gold', 'Liquid'], ['Low', 'Very Low'], screener_agent.run("Conservative"))
+        fund4 = find_best(['Gold', 'Liquid'], ['Low', 'Very Low'], screener_agent.run("Conservative", snapshot))
         if fund1: final_schemes_list.append({"fund": fund1, "percent": 30})
         if fund2: final_schemes_list.append({"fund": fund2, "percent": 30})
         if fund3: final_schemes_list.append({"fund": fund3, "percent": 20})
@@ -124,7 +487,7 @@ def generate_portfolio_route():
         final_portfolio_plan["allocation"] = {"Medium Risk Equity/Index": 40, "Low Risk Debt/Gold": 40, "Very Low Risk FD/Liquid": 20}
         fund1 = find_best(['Index Fund', 'Large-Cap', 'Flexi-Cap'], ['Medium'], shortlisted_funds)
         fund2 = find_best(['Gold', 'Short-Term Debt'], ['Low'], shortlisted_funds)
-        fund3 = find_best(['Fixed Deposit', 'Liquid'], ['Very Low'], screener_agent.run("Very Conservative"))
+        fund3 = find_best(['Fixed Deposit', 'Liquid'], ['Very Low'], screener_agent.run("Very Conservative", snapshot))
         if fund1: final_schemes_list.append({"fund": fund1, "percent": 40})
         if fund2: final_schemes_list.append({"fund": fund2, "percent": 40})
         if fund3: final_schemes_list.append({"fund": fund3, "percent": 20})
@@ -143,10 +506,36 @@ def generate_portfolio_route():
         if fund1: final_schemes_list.append({"fund": fund1, "percent": 70})
         if fund2: final_schemes_list.append({"fund": fund2, "percent": 30})
 
+
+    return final_portfolio_plan, final_schemes_list
+
+def build_portfolio_response(risk_profile, snapshot):
+    """
+    Runs Agents 2-4 for one risk profile against one scheme snapshot.
+    Returns (response_dict, status). Only called when PortfolioResponseCache
+    builds its table, never per request.
+    """
+    began = time.perf_counter()
+    shortlisted_funds = screener_agent.run(risk_profile, snapshot)
+    screened = time.perf_counter()
+    STAGE_SECONDS.observe(screened - began, "screener")
+    logger.debug("[Agent 2 - Screener]: Found %d matching funds for '%s'.", len(shortlisted_funds), risk_profile)
+
+    # Efficient-frontier weights were computed offline and planned when the snapshot loaded
+    planned = snapshot.allocations.get(risk_profile)
+    if planned is not None:
+        allocation, funds = planned
+        final_portfolio_plan = {"allocation": allocation}
+        final_schemes_list = [{"fund": fund, "percent": percent} for fund, percent in funds]
+    elif not shortlisted_funds:
+         return {"error": f"No suitable funds found for profile '{risk_profile}'"}, 404
+    else:
+        final_portfolio_plan, final_schemes_list = rule_based_allocation(risk_profile, shortlisted_funds, snapshot)
+
     # --- Recalculate percentages if some funds were not found ---
     total_percent = sum(item['percent'] for item in final_schemes_list)
     if total_percent > 0 and total_percent != 100:
-         print(f"WARN: Adjusting percentages from {total_percent}% to 100%")
+         logger.warning("Adjusting percentages from %s%% to 100%% for '%s'", total_percent, risk_profile)
          for item in final_schemes_list:
               item['percent'] = round((item['percent'] / total_percent) * 100)
     # Ensure it sums to 100 after rounding
@@ -155,22 +544,16 @@ def generate_portfolio_route():
         diff = 100 - current_sum
         final_schemes_list[0]['percent'] += diff # Add difference to the first item
 
-    print(f"[Agent 3 - Manager v2.0]: Portfolio structure created.")
+    allocated = time.perf_counter()
+    STAGE_SECONDS.observe(allocated - screened, "allocation")
+    logger.debug("[Agent 3 - Manager v2.0]: Portfolio structure created.")
 
     # XAI Agent ah koopidunga
-    final_explained_schemes = []
-    for item in final_schemes_list:
-        fund_object = item["fund"]
-        fund_percent = item["percent"]
-        reasons = explainer_agent.run(fund_object, risk_profile)
-        print(f"[Agent 4 - Explainer v2.0]: Explaining '{fund_object['scheme_name']}'...")
-        fund_object['explanation'] = reasons
-        fund_object['percent'] = fund_percent
-        # Remove unnecessary internal data before sending to frontend
-        fund_object.pop('ticker', None) 
-        fund_object.pop('volatility', None) 
-        fund_object.pop('sharpe_ratio', None) 
-        final_explained_schemes.append(fund_object)
+    logger.debug("[Agent 4 - Explainer v2.0]: Explaining %d funds...", len(final_schemes_list))
+    explanations = explainer_agent.explain_many([item["fund"] for item in final_schemes_list], risk_profile, snapshot)
+    # item["fund"] is a read-only SchemeRecord shared across requests; each view is a new dict
+    final_explained_schemes = [public_fund_view(item["fund"], item["percent"], explanation)
+                               for item, explanation in zip(final_schemes_list, explanations)]
 
     final_response = {
         "profile": risk_profile,
@@ -178,30 +561,303 @@ def generate_portfolio_route():
         "schemes": final_explained_schemes
     }
 
-    print("--- Complete Response v2.0 Ready. Sending to Frontend. ---")
-    return jsonify(final_response)
+    STAGE_SECONDS.observe(time.perf_counter() - allocated, "explainer")
+    logger.debug("--- Response v2.0 Ready for '%s' (snapshot %s) ---", risk_profile, snapshot.version)
+    return final_response, 200
+
+def holding_percent(value):
+    # JSON number in 0..100 - anything else would fail the NOT NULL/Float column or break projections
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or not 0 <= value <= 100:
+        raise ValueError(f"'percent' must be a number between 0 and 100, got {value!r}")
+    return value
+
+def holdings_from_payload(schemes, snapshot):
+    """
+    [(ticker, percent)] for the `schemes` list a client saves (the list
+    /generate_portfolio returned). Funds are matched by ticker if present,
+    otherwise by scheme_name. Raises ValueError for unknown or ambiguous
+    funds and bad percents.
+    """
+    if not isinstance(schemes, list):
+        raise ValueError("'schemes' must be a list")
+    holdings = []
+    for item in schemes:
+        if not isinstance(item, dict):
+            raise ValueError("Each entry of 'schemes' must be an object")
+        ticker, name = item.get('ticker'), item.get('scheme_name')
+        if not ticker and isinstance(name, str):
+            # The public view has no ticker, so saves usually come by name
+            if name in snapshot.ambiguous_names:
+                raise ValueError(f"Scheme name {name!r} matches more than one fund, send its ticker")
+            ticker = snapshot.ticker_by_name.get(name)
+        if not isinstance(ticker, str) or ticker not in snapshot.by_ticker:
+            raise ValueError(f"Unknown scheme: {item.get('ticker') or name!r}")
+        holdings.append((ticker, holding_percent(item.get('percent', 0))))
+    return holdings
+
+# INSERT ... ON CONFLICT DO UPDATE - same construct in both, other databases have no upsert here
+UPSERT_INSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+
+def upsert_insert(model, dialect_name):
+    if dialect_name not in UPSERT_INSERTS:
+        raise RuntimeError(f"Scheme upserts need SQLite or PostgreSQL, not {dialect_name}")
+    return UPSERT_INSERTS[dialect_name](model)
+
+def upsert_schemes(tickers, snapshot):
+    # Metadata row per ticker, refreshed from the current snapshot
+    rows = [{
+        "ticker": ticker,
+        "scheme_name": snapshot.by_ticker[ticker]['scheme_name'],
+        "category": snapshot.by_ticker[ticker]['category'],
+        "risk_label": snapshot.by_ticker[ticker].get('risk_label'),
+        "snapshot_version": snapshot.version,
+    } for ticker in sorted(set(tickers))]
+    if not rows:
+        return
+    statement = upsert_insert(Scheme, db.session.get_bind().dialect.name)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['ticker'],
+        set_={c: statement.excluded[c] for c in ('scheme_name', 'category', 'risk_label', 'snapshot_version')},
+        where=Scheme.snapshot_version != statement.excluded.snapshot_version,
+    ), rows)
+
+def save_portfolio_rows(user_id, items, snapshot):
+    """Insert portfolios + holdings for one user in the current transaction. Returns new ids."""
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("Each portfolio must be an object")
+        # Optional (older clients don't send it): saved as NULL and explained without the
+        # profile-matching reasons. If given, explanations are rebuilt per profile - only known ones
+        profile = item.get('profile')
+        if profile is not None and (not isinstance(profile, str) or profile not in PROFILE_RULES):
+            raise ValueError(f"'profile' must be one of {', '.join(PROFILE_RULES)}, or left out")
+    parsed = [(item, holdings_from_payload(item.get('schemes'), snapshot)) for item in items]
+    upsert_schemes([ticker for _, holdings in parsed for ticker, _ in holdings], snapshot)
+    portfolio_ids = db.session.scalars(
+        insert(Portfolio).returning(Portfolio.id, sort_by_parameter_order=True),
+        [{
+            "profile_name": item.get('profile_name', 'My Portfolio'),
+            "risk_profile": item.get('profile'),
+            "allocation": json.dumps(item.get('allocation')),
+            "schemes": '',
+            "user_id": user_id,
+        } for item, _ in parsed],
+    ).all()
+    holding_rows = [
+        {"portfolio_id": portfolio_id, "scheme_ticker": ticker, "percent": percent,
+         "snapshot_version": snapshot.version}
+        for portfolio_id, (_, holdings) in zip(portfolio_ids, parsed)
+        for ticker, percent in holdings
+    ]
+    if holding_rows:
+        db.session.execute(insert(Holding), holding_rows)
+    return portfolio_ids
+
+def saved_holdings(portfolio, snapshot):
+    """[(ticker, percent)] of a saved portfolio, leaving out schemes no longer in the snapshot."""
+    if portfolio.holdings:
+        return [(h.scheme_ticker, h.percent) for h in portfolio.holdings if h.scheme_ticker in snapshot.by_ticker]
+    holdings = []
+    for item in json.loads(portfolio.schemes) if portfolio.schemes else []: # rows saved before holdings
+        ticker = item.get('ticker') or snapshot.ticker_by_name.get(item.get('scheme_name'))
+        if ticker in snapshot.by_ticker:
+            holdings.append((ticker, item.get('percent', 0)))
+    return holdings
+
+def projection_options(data):
+    """years/paths/seed/initial_amount from a body or query string. Raises ValueError."""
+    try:
+        options = {
+            "years": int(data.get('years', DEFAULT_YEARS)),
+            "paths": int(data.get('paths', DEFAULT_PATHS)),
+            "seed": int(data.get('seed', 0)), # fixed default - same request, same bands
+            "initial_amount": float(data.get('initial_amount', 1.0)),
+        }
+    except (TypeError, ValueError):
+        raise ValueError("years, paths and seed must be integers, initial_amount a number")
+    if not 1 <= options["years"] <= MAX_YEARS:
+        raise ValueError(f"years must be between 1 and {MAX_YEARS}")
+    if not 100 <= options["paths"] <= MAX_PATHS:
+        raise ValueError(f"paths must be between 100 and {MAX_PATHS}")
+    if not options["initial_amount"] > 0:
+        raise ValueError("initial_amount must be positive")
+    return options
+
+def portfolio_view(portfolio, snapshot):
+    """Full fund view for a saved portfolio, rebuilt from the current scheme snapshot."""
+    if portfolio.holdings:
+        schemes = []
+        for holding in portfolio.holdings:
+            fund = snapshot.by_ticker.get(holding.scheme_ticker)
+            if fund is not None:
+                explanation = explainer_agent.run(fund, portfolio.risk_profile, snapshot)
+            else: # Dropped from the scheme list since saving - fall back to stored metadata
+                meta = db.session.get(Scheme, holding.scheme_ticker)
+                fund = {"scheme_name": meta.scheme_name, "category": meta.category, "risk_label": meta.risk_label}
+                explanation = explainer_agent.run(fund, portfolio.risk_profile)
+            percent = int(holding.percent) if float(holding.percent).is_integer() else holding.percent
+            schemes.append(public_fund_view(fund, percent, explanation))
+    else:
+        schemes = json.loads(portfolio.schemes) if portfolio.schemes else [] # rows saved before holdings
+    return {
+        "id": portfolio.id,
+        "profile_name": portfolio.profile_name,
+        "profile": portfolio.risk_profile,
+        "allocation": json.loads(portfolio.allocation),
+        "schemes": schemes,
+    }
 
 @app.route("/save_portfolio", methods=["POST"])
 @jwt_required() 
 def save_portfolio():
-    # (No change needed here)
-    current_user_id = get_jwt_identity()
+    current_user_id = int(get_jwt_identity())
     data = request.json
-    new_portfolio = Portfolio(
-        profile_name = data.get('profile_name', 'My Portfolio'),
-        allocation = json.dumps(data.get('allocation')),
-        schemes = json.dumps(data.get('schemes')),
-        user_id = current_user_id
-    )
-    db.session.add(new_portfolio)
+    try:
+        portfolio_ids = save_portfolio_rows(current_user_id, [data], screener_agent.snapshot)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
     db.session.commit()
-    return jsonify({"message": "Portfolio saved successfully"}), 201
+    return jsonify({"message": "Portfolio saved successfully", "id": portfolio_ids[0]}), 201
+
+@app.route("/save_portfolios", methods=["POST"])
+@jwt_required()
+def save_portfolios():
+    # Batch version of /save_portfolio: body {"portfolios": [...]} - all rows in ONE transaction
+    current_user_id = int(get_jwt_identity())
+    items = (request.json or {}).get('portfolios')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "'portfolios' must be a non-empty list"}), 400
+    if len(items) > app.config['PORTFOLIO_BATCH_MAX']:
+        return jsonify({"error": f"At most {app.config['PORTFOLIO_BATCH_MAX']} portfolios per request"}), 413
+    try:
+        portfolio_ids = save_portfolio_rows(current_user_id, items, screener_agent.snapshot)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    db.session.commit()
+    return jsonify({"message": f"{len(portfolio_ids)} portfolios saved successfully",
+                    "count": len(portfolio_ids), "ids": portfolio_ids}), 201
+
+@app.route("/portfolios/<int:portfolio_id>", methods=["GET"])
+@jwt_required()
+def get_portfolio(portfolio_id):
+    current_user_id = int(get_jwt_identity())
+    portfolio = db.session.get(Portfolio, portfolio_id)
+    if portfolio is None or portfolio.user_id != current_user_id:
+        return jsonify({"error": "Portfolio not found"}), 404
+    return jsonify(portfolio_view(portfolio, screener_agent.snapshot))
+
+def project_admitted(snapshot, holdings, options):
+    # Cached runs are a dict lookup; only a fresh simulation waits for a slot
+    result = projector.peek(snapshot, holdings, **options)
+    if result is not None:
+        limiters['projection'].bypass()
+        return result
+    with limiters['projection'].admit():
+        return projector.project(snapshot, holdings, **options)
+
+@app.route("/project_portfolio", methods=["POST"])
+def project_portfolio():
+    """
+    Monte Carlo projection for a portfolio as /generate_portfolio returned it:
+    {"schemes": [...], "years": 10, "paths": 10000, "seed": 0, "initial_amount": 100000}
+    -> yearly p5/p25/p50/p75/p95 of its value.
+    """
+    data = request.json or {}
+    snapshot = screener_agent.snapshot
+    try:
+        options = projection_options(data)
+        result = project_admitted(snapshot, holdings_from_payload(data.get('schemes'), snapshot), options)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+@app.route("/portfolios/<int:portfolio_id>/projection", methods=["GET"])
+@jwt_required()
+def get_portfolio_projection(portfolio_id):
+    current_user_id = int(get_jwt_identity())
+    portfolio = db.session.get(Portfolio, portfolio_id)
+    if portfolio is None or portfolio.user_id != current_user_id:
+        return jsonify({"error": "Portfolio not found"}), 404
+    snapshot = screener_agent.snapshot
+    try:
+        result = project_admitted(snapshot, saved_holdings(portfolio, snapshot), projection_options(request.args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(dict(result, id=portfolio.id))
+
+@app.route("/portfolios/projections", methods=["POST"])
+@jwt_required()
+def project_saved_portfolios():
+    """
+    Batched projection of saved portfolios: body {"ids": [...], years/paths/seed/initial_amount}.
+    Without ids, the newest PORTFOLIO_PAGE_MAX portfolios. All of them are
+    simulated on one shared set of paths.
+    """
+    current_user_id = int(get_jwt_identity())
+    data = request.json or {}
+    ids = data.get('ids')
+    limit = app.config['PORTFOLIO_PAGE_MAX']
+    if ids is not None and (not isinstance(ids, list) or len(ids) > limit):
+        return jsonify({"error": f"'ids' must be a list of at most {limit} portfolio ids"}), 400
+    try:
+        options = projection_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = (select(Portfolio).where(Portfolio.user_id == current_user_id)
+             .options(selectinload(Portfolio.holdings)) # all holdings in one extra query
+             .order_by(Portfolio.id.desc()).limit(limit))
+    if ids is not None:
+        query = query.where(Portfolio.id.in_(ids))
+    portfolios = db.session.execute(query).scalars().all()
+
+    snapshot = screener_agent.snapshot
+    # Each portfolio checked on its own - one bad saved row only fails its own entry
+    holdings, errors = {}, {}
+    for p in portfolios:
+        try:
+            holdings[p.id] = normalize_holdings(saved_holdings(p, snapshot))
+        except ValueError as e:
+            errors[p.id] = str(e)
+    try:
+        with limiters['projection_batch'].admit():
+            results = dict(zip(holdings, projector.project_many(snapshot, list(holdings.values()), **options)))
+    except ValueError as e: # whole batch over the simulation budget
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"projections": [
+        dict(results[p.id], id=p.id) if p.id in results else {"id": p.id, "error": errors[p.id]}
+        for p in portfolios
+    ]})
+
+@app.route("/portfolios", methods=["GET"])
+@jwt_required()
+def list_portfolios():
+    """
+    Newest first, keyset paginated: ?limit=20&cursor=<next_cursor from previous page>.
+    Only summary columns are read - the allocation/schemes JSON is never loaded.
+    """
+    current_user_id = int(get_jwt_identity())
+    limit = min(max(request.args.get('limit', 20, type=int), 1), app.config['PORTFOLIO_PAGE_MAX'])
+    cursor = request.args.get('cursor', type=int)
+    query = (select(Portfolio.id, Portfolio.profile_name)
+             .where(Portfolio.user_id == current_user_id)
+             .order_by(Portfolio.id.desc())
+             .limit(limit + 1))
+    if cursor is not None:
+        query = query.where(Portfolio.id < cursor)
+    rows = db.session.execute(query).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify({
+        "portfolios": [{"id": row.id, "profile_name": row.profile_name} for row in rows],
+        "next_cursor": rows[-1].id if has_more else None,
+    })
 
 # --- 5. RUN THE SERVER ---
 if __name__ == "__main__":
-    init_agents() # Agents ah initialize pannunga
-    with app.app_context():
-        db.create_all() 
-        print("Database tables checked/created.")
-
+    # DEBUG shows every agent step while the response table builds; sampled requests log at INFO
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    create_app() # DB + Agents ah initialize pannunga (gunicorn: see gunicorn.conf.py)
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,62 @@
+# benchmarks/bench_agents.py
+"""Micro-benchmarks for the agent pipeline on synthetic universes."""
+import itertools
+import random
+
+from scheme_snapshot import SchemeSnapshot
+from user_profile_agent import UserProfileAgent
+from fund_screener_agent import FundScreenerAgent
+from explainable_ai_agent import ExplainableAIAgent
+from portfolio_projection import PortfolioProjector
+
+from benchmarks.synthetic import make_universe
+from benchmarks.timing import measure, time_once
+
+PROFILES = ("Aggressive", "Moderate", "Conservative", "Very Conservative")
+
+
+def quiz_payloads(seed=0):
+    rng = random.Random(seed)
+    answers = ("A", "B", "C")
+    horizons = ("7+ Years", "3-7 Years", "0-3 Years")
+    return [{"Quiz_Answer_1": rng.choice(answers), "Quiz_Answer_2": rng.choice(answers),
+             "horizon": rng.choice(horizons)} for _ in range(256)]
+
+
+def bench_universe(size, min_time=0.2):
+    import app as backend # imported late: DATABASE_URL must be set by the runner first
+
+    schemes = make_universe(size)
+    snapshot_seconds, snapshot = time_once(lambda: SchemeSnapshot(schemes, version=f"synthetic-{size}"))
+
+    profile_agent = UserProfileAgent()
+    screener_agent = FundScreenerAgent(snapshot)
+    explainer_agent = ExplainableAIAgent()
+    payloads = itertools.cycle(quiz_payloads())
+    profiles = itertools.cycle(PROFILES)
+    funds = itertools.cycle(screener_agent.run("Aggressive") + screener_agent.run("Very Conservative"))
+
+    holdings = [(fund["ticker"], 25) for fund in screener_agent.run("Aggressive")[:4]]
+    seeds = itertools.count()
+    # build_portfolio_response reads the module globals in app
+    backend.profile_agent, backend.screener_agent, backend.explainer_agent = profile_agent, screener_agent, explainer_agent
+    cache = backend.PortfolioResponseCache(profile_agent, backend.build_portfolio_response, backend.encode_json)
+    warm_seconds, _ = time_once(lambda: cache.warm(snapshot))
+    allocation = measure(lambda: backend.build_portfolio_response(next(profiles), snapshot), min_time)
+
+    return {
+        "size": size,
+        "snapshot_build_s": round(snapshot_seconds, 4),
+        "response_cache_warm_s": round(warm_seconds, 4),
+        "UserProfileAgent.run": measure(lambda: profile_agent.run(next(payloads)), min_time),
+        "FundScreenerAgent.run": measure(lambda: screener_agent.run(next(profiles)), min_time),
+        "ExplainableAIAgent.run": measure(lambda: explainer_agent.run(next(funds), next(profiles)), min_time),
+        "ExplainableAIAgent.explain_many_shortlist": measure(
+            lambda: explainer_agent.explain_many(screener_agent.run("Aggressive"), "Aggressive", snapshot), min_time),
+        "build_portfolio_response": allocation,
+        # New seed every call - never served from the projector's cache
+        "PortfolioProjector.project_10k_paths_10y": measure(
+            lambda: PortfolioProjector().project(snapshot, holdings, seed=next(seeds)), min_time),
+        "cached_response_lookup": measure(
+            lambda: cache.get(profile_agent.normalize(next(payloads)), snapshot), min_time),
+    }
@@ -0,0 +1,59 @@
+# benchmarks/bench_data_preparation.py
+"""data_preparation stages on synthetic price fixtures (FilePriceSource stands in for yfinance)."""
+import contextlib
+import io
+import os
+import tempfile
+
+from price_sources import FilePriceSource, fetch_closes
+from price_store import PriceStore
+from risk_features import align_closes, compute_risk_features
+from risk_model import RiskClusterModel
+import data_preparation
+
+from benchmarks.synthetic import write_price_fixtures
+from benchmarks.timing import time_once
+
+
+def bench_tickers(n_tickers, workers=8):
+    with tempfile.TemporaryDirectory() as tmp:
+        tickers = [f"SYN{i:07d}.NS" for i in range(n_tickers)]
+        source = FilePriceSource(write_price_fixtures(tickers, os.path.join(tmp, "prices")))
+        store = PriceStore(os.path.join(tmp, "store"))
+
+        fetch_s, (closes, summary) = time_once(lambda: fetch_closes(source, tickers, max_workers=workers))
+        with contextlib.redirect_stdout(io.StringIO()):
+            store_full_s, _ = time_once(
+                lambda: data_preparation.update_price_store(store, source, tickers, max_workers=workers))
+            store_incremental_s, _ = time_once(
+                lambda: data_preparation.update_price_store(store, source, tickers, max_workers=workers))
+        rows = {t: store.rows(t) for t in tickers}
+        align_s, aligned = time_once(lambda: align_closes(rows))
+        features_s, features = time_once(lambda: compute_risk_features(*aligned))
+        features = features.dropna(subset=data_preparation.AI_FEATURES)
+        fit_s, model = time_once(lambda: RiskClusterModel.fit(features, data_preparation.AI_FEATURES, mode="auto"))
+        predict_s, _ = time_once(lambda: model.predict(features))
+
+    return {
+        "tickers": n_tickers,
+        "fetch_closes_s": round(fetch_s, 4),
+        "fetch_failed": len(summary.failed),
+        "price_store_full_fill_s": round(store_full_s, 4),
+        "price_store_incremental_s": round(store_incremental_s, 4),
+        "align_closes_s": round(align_s, 4),
+        "compute_risk_features_s": round(features_s, 4),
+        "cluster_fit_s": round(fit_s, 4),
+        "cluster_predict_s": round(predict_s, 5),
+    }
+
+
+def bench_labeling_job():
+    """The real run_ai_labeling_job, fully offline, on the built-in scheme list."""
+    with tempfile.TemporaryDirectory() as tmp:
+        tickers = [s["ticker"] for s in data_preparation.get_all_scheme_types() if s["has_market_data"]]
+        source = FilePriceSource(write_price_fixtures(tickers, os.path.join(tmp, "prices")))
+        kwargs = dict(store_dir=os.path.join(tmp, "store"), model_dir=os.path.join(tmp, "models"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            first_s, _ = time_once(lambda: data_preparation.run_ai_labeling_job(source, **kwargs))
+            second_s, _ = time_once(lambda: data_preparation.run_ai_labeling_job(source, **kwargs))
+    return {"first_run_s": round(first_s, 4), "incremental_run_s": round(second_s, 4)}
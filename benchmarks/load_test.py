@@ -0,0 +1,112 @@
+# benchmarks/load_test.py
+"""
+Closed-loop HTTP load test: `concurrency` client threads with keep-alive
+connections hammer one endpoint for `seconds`, recording every latency.
+Runs against an in-process server by default, or any --url (e.g. gunicorn).
+"""
+import http.client
+import itertools
+import json
+import logging
+import threading
+import time
+import urllib.parse
+
+from benchmarks.bench_agents import quiz_payloads
+from benchmarks.timing import percentiles
+
+
+def start_local_server(schemes_file):
+    """Serve app.py from a background thread; returns (server, base_url)."""
+    from werkzeug.serving import make_server
+    import app as backend
+
+    backend.create_app(schemes_file, start_refresher=False)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING) # no access log line per request
+    server = make_server("127.0.0.1", 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def _request(base_url, method, path, body=None, headers=None):
+    url = urllib.parse.urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+    connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                       headers={"Content-Type": "application/json", **(headers or {})})
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, json.loads(data) if data else None
+
+
+def prepare_auth(base_url, email="bench@example.com", password="bench-password"):
+    _request(base_url, "POST", "/signup", {"email": email, "password": password})
+    status, body = _request(base_url, "POST", "/login", {"email": email, "password": password})
+    if status != 200:
+        raise RuntimeError(f"login failed during benchmark setup: {status} {body}")
+    return {"email": email, "password": password, "token": body["access_token"]}
+
+
+def run_load(base_url, method, path, bodies, headers=None, seconds=5.0, concurrency=8):
+    url = urllib.parse.urlsplit(base_url)
+    latencies = [[] for _ in range(concurrency)]
+    statuses = [{} for _ in range(concurrency)]
+    deadline = time.perf_counter() + seconds
+
+    def client(slot):
+        connection = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+        body_iter = itertools.cycle(bodies)
+        while time.perf_counter() < deadline:
+            payload = json.dumps(next(body_iter))
+            began = time.perf_counter()
+            try:
+                connection.request(method, path, body=payload,
+                                   headers={"Content-Type": "application/json", **(headers or {})})
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader("Connection", "").lower() == "close":
+                    connection.close()
+            except (OSError, http.client.HTTPException):
+                status = "error"
+                connection.close()
+                connection = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+            latencies[slot].append((time.perf_counter() - began) * 1000)
+            statuses[slot][status] = statuses[slot].get(status, 0) + 1
+        connection.close()
+
+    began = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    all_latencies = [ms for slot in latencies for ms in slot]
+    status_counts = {}
+    for slot in statuses:
+        for status, count in slot.items():
+            status_counts[str(status)] = status_counts.get(str(status), 0) + count
+    return {
+        "endpoint": f"{method} {path}",
+        "concurrency": concurrency,
+        "requests": len(all_latencies),
+        "throughput_rps": round(len(all_latencies) / elapsed, 1),
+        "status_counts": status_counts,
+        **percentiles(all_latencies),
+    }
+
+
+def run_all(base_url, seconds=5.0, concurrency=8):
+    auth = prepare_auth(base_url)
+    payloads = quiz_payloads()
+    _, portfolio = _request(base_url, "POST", "/generate_portfolio", payloads[0])
+    portfolio = dict(portfolio, profile_name="Benchmark Portfolio")
+    return [
+        run_load(base_url, "POST", "/generate_portfolio", payloads, seconds=seconds, concurrency=concurrency),
+        run_load(base_url, "POST", "/login", [{"email": auth["email"], "password": auth["password"]}],
+                 seconds=seconds, concurrency=concurrency),
+        run_load(base_url, "POST", "/save_portfolio", [portfolio],
+                 headers={"Authorization": f"Bearer {auth['token']}"}, seconds=seconds, concurrency=concurrency),
+    ]
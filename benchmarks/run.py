@@ -0,0 +1,160 @@
+# benchmarks/run.py
+"""
+Offline benchmark suite.
+
+    python -m benchmarks.run                       # everything, default sizes
+    python -m benchmarks.run --sizes 10,1000 --load-seconds 3
+    python -m benchmarks.run --url http://127.0.0.1:8000   # load test an already running server
+    python -m benchmarks.run compare OLD.json NEW.json
+
+Results go to benchmarks/results/<timestamp>-<commit>.json.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_SIZES = "10,1000,100000,1000000"
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="portfolio-bench-")
+    # Never touch the real site.db - must be set before app is imported
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from benchmarks.bench_agents import bench_universe
+    from benchmarks.bench_data_preparation import bench_tickers, bench_labeling_job
+    from benchmarks.load_test import run_all, start_local_server
+    from benchmarks.synthetic import write_universe
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "agents": [],
+        "data_preparation": {},
+        "load": [],
+    }
+
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        print(f"[agents] universe of {size} schemes...", flush=True)
+        results["agents"].append(bench_universe(size, min_time=args.min_time))
+
+    if not args.skip_data_prep:
+        results["data_preparation"]["tickers"] = []
+        for n in [int(s) for s in args.tickers.split(",") if s]:
+            print(f"[data_preparation] {n} tickers...", flush=True)
+            results["data_preparation"]["tickers"].append(bench_tickers(n))
+        print("[data_preparation] run_ai_labeling_job...", flush=True)
+        results["data_preparation"]["labeling_job"] = bench_labeling_job()
+
+    if not args.skip_load:
+        server = None
+        base_url = args.url
+        if base_url is None:
+            schemes_file = write_universe(args.load_size, os.path.join(workdir, "schemes.json"))
+            server, base_url = start_local_server(schemes_file)
+        print(f"[load] {base_url} for {args.load_seconds}s x 3 endpoints...", flush=True)
+        results["load"] = run_all(base_url, seconds=args.load_seconds, concurrency=args.concurrency)
+        if server is not None:
+            server.shutdown()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)) if args.out else RESULTS_DIR, exist_ok=True)
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['meta']['commit']}.json")
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {out}")
+    return results
+
+
+def _flatten(results):
+    """{metric path: number} for the numbers worth comparing (lower is better)."""
+    flat = {}
+    for entry in results.get("agents", []):
+        for key, value in entry.items():
+            if isinstance(value, dict):
+                flat[f"agents[{entry['size']}].{key}.median_us"] = value["median_us"]
+            elif key.endswith("_s"):
+                flat[f"agents[{entry['size']}].{key}"] = value
+    prep = results.get("data_preparation", {})
+    for entry in prep.get("tickers", []):
+        for key, value in entry.items():
+            if key.endswith("_s"):
+                flat[f"data_preparation[{entry['tickers']}].{key}"] = value
+    for key, value in prep.get("labeling_job", {}).items():
+        flat[f"labeling_job.{key}"] = value
+    for entry in results.get("load", []):
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            flat[f"load[{entry['endpoint']}].{key}"] = entry[key]
+        # Throughput: higher is better, compare as seconds per request
+        if entry["throughput_rps"]:
+            flat[f"load[{entry['endpoint']}].ms_per_request"] = round(1000 / entry["throughput_rps"], 4)
+    return flat
+
+
+def compare(old_path, new_path, threshold=0.10):
+    with open(old_path) as f:
+        old = _flatten(json.load(f))
+    with open(new_path) as f:
+        new = _flatten(json.load(f))
+    regressions = 0
+    for key in sorted(set(old) & set(new)):
+        before, after = old[key], new[key]
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        flag = ""
+        if change > threshold:
+            flag, regressions = "  <-- slower", regressions + 1
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{key:70s} {before:>12.4f} -> {after:>12.4f} ({change:+.1%}){flag}")
+    print(f"\n{regressions} metric(s) regressed by more than {threshold:.0%}")
+    return regressions
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "compare":
+        parser = argparse.ArgumentParser(prog="python -m benchmarks.run compare")
+        parser.add_argument("old")
+        parser.add_argument("new")
+        parser.add_argument("--threshold", type=float, default=0.10, help="relative change that counts as a regression")
+        args = parser.parse_args(argv[1:])
+        return 1 if compare(args.old, args.new, args.threshold) else 0
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="synthetic universe sizes for the agent benchmarks")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing round")
+    parser.add_argument("--tickers", default="100,1000", help="ticker counts for the data_preparation benchmarks")
+    parser.add_argument("--skip-data-prep", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--url", help="load test this server instead of an in-process one")
+    parser.add_argument("--load-size", type=int, default=1000, help="universe size for the in-process server")
+    parser.add_argument("--load-seconds", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--out", help="result file (default benchmarks/results/<timestamp>-<commit>.json)")
+    run(parser.parse_args(argv))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# benchmarks/synthetic.py
+"""
+Synthetic, offline stand-ins for the real data: scheme universes of any
+size in the schemes_master_list_v2.json format, and daily price fixtures
+that FilePriceSource (the yfinance stand-in) can read.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# (category, risk_label, volatility mean, sharpe mean, weight in the universe)
+CATEGORIES = [
+    ("Index Fund (Large-Cap)", "Medium", 0.12, 1.0, 0.15),
+    ("Index Fund (Sectoral)", "High", 0.16, 0.8, 0.05),
+    ("Flexi-Cap Equity", "Medium", 0.15, 0.9, 0.15),
+    ("Large-Cap Stock", "High", 0.22, 0.5, 0.10),
+    ("Mid-Cap Equity", "High", 0.20, 0.7, 0.10),
+    ("Small-Cap Equity", "High", 0.26, 0.6, 0.10),
+    ("IT Stock", "High", 0.25, 0.3, 0.05),
+    ("Short-Term Debt", "Low", 0.03, 1.5, 0.10),
+    ("Gold ETF", "Low", 0.13, 1.2, 0.05),
+    ("Liquid Debt", "Very Low", 0.01, 2.5, 0.10),
+    ("Fixed Deposit", "Very Low", 0.0, 0.5, 0.03),
+    ("Gold Bond", "Very Low", 0.13, 0.5, 0.02),
+]
+
+
+def make_universe(n, seed=0):
+    """`n` scheme dicts shaped like schemes_master_list_v2.json entries."""
+    rng = np.random.default_rng(seed)
+    weights = np.array([c[4] for c in CATEGORIES])
+    picks = rng.choice(len(CATEGORIES), size=n, p=weights / weights.sum())
+    vol_noise = rng.lognormal(0, 0.25, size=n)
+    sharpe_noise = rng.normal(0, 0.4, size=n)
+    schemes = []
+    for i, c in enumerate(picks):
+        category, risk_label, vol, sharpe, _ = CATEGORIES[c]
+        scheme = {
+            "scheme_name": f"Synthetic {category} {i}",
+            "category": category,
+            "ticker": f"SYN{i:07d}.NS",
+            "volatility": float(vol * vol_noise[i]),
+            "sharpe_ratio": float(sharpe + sharpe_noise[i]),
+            "risk_label": risk_label,
+        }
+        if category in ("Fixed Deposit", "Gold Bond"):
+            scheme["avg_return"] = 0.07 if category == "Fixed Deposit" else 0.08
+        schemes.append(scheme)
+    return schemes
+
+
+def write_universe(n, path, seed=0):
+    with open(path, "w") as f:
+        json.dump(make_universe(n, seed), f)
+    return path
+
+
+def write_price_fixtures(tickers, directory, years=5, seed=0):
+    """One <ticker>.csv (Date, Close) per ticker - geometric random walks."""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp("2025-10-01"), periods=252 * years)
+    for ticker in tickers:
+        vol = rng.uniform(0.01, 0.35)
+        returns = rng.normal(0.10 / 252, vol / np.sqrt(252), len(dates))
+        closes = 100 * np.exp(np.cumsum(returns))
+        pd.DataFrame({"Date": dates, "Close": closes}).to_csv(
+            os.path.join(directory, f"{ticker}.csv"), index=False)
+    return directory
@@ -0,0 +1,47 @@
+# benchmarks/timing.py
+import statistics
+import time
+
+
+def measure(fn, min_time=0.2, repeat=5):
+    """
+    Call `fn` in batches until each of `repeat` rounds lasts `min_time`;
+    report per-call microseconds (best / median round).
+    """
+    number = 1
+    while True:
+        began = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - began >= min_time / 10 or number >= 1 << 20:
+            break
+        number *= 10
+    rounds = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        calls = 0
+        while True:
+            for _ in range(number):
+                fn()
+            calls += number
+            elapsed = time.perf_counter() - began
+            if elapsed >= min_time:
+                break
+        rounds.append(elapsed / calls * 1e6)
+    return {"calls_per_round": calls, "best_us": round(min(rounds), 3), "median_us": round(statistics.median(rounds), 3)}
+
+
+def time_once(fn):
+    """Wall time of a single call, seconds."""
+    began = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - began, result
+
+
+def percentiles(latencies_ms):
+    ordered = sorted(latencies_ms)
+    if not ordered:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(ordered[-1], 3)}
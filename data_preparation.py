@@ -1,13 +1,28 @@
 import pandas as pd
-import yfinance as yf
 import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
+import argparse
+import datetime
+import logging
 import warnings
 import json
+import time
+from metrics import REGISTRY
+from scheme_snapshot import SCHEMES_FILE, content_version, write_schemes_file, write_allocation_model
+from price_sources import YFinancePriceSource, FilePriceSource, fetch_closes
+from price_store import PriceStore, PRICE_STORE_DIR
+from risk_features import align_closes, compute_risk_features, returns_covariance
+from portfolio_optimizer import optimize_profiles
+from risk_model import RiskClusterModel, MODEL_DIR
+
+HISTORY_DAYS = 5 * 366 # longest feature window (5y) read from the store
+AI_FEATURES = ['volatility', 'sharpe_ratio'] # columns the K-Means model clusters on
 
 warnings.filterwarnings("ignore")
 
+# Only scraped when the job runs inside the API process (SchemeRefresher relabel)
+JOB_STAGE_SECONDS = REGISTRY.histogram(
+    "data_preparation_stage_seconds", "run_ai_labeling_job time per stage", ("stage",))
+
 def get_all_scheme_types():
     """
     UPDATED: Includes diverse schemes: MFs, ETFs, Stocks, FD, SGB.
@@ -45,45 +60,171 @@ def get_all_scheme_types():
     ]
     return schemes
 
-def get_scheme_features(ticker):
+OVERLAP_TOLERANCE = 1e-5 # relative change of the overlap bar that means the source re-adjusted history
+
+def _readjusted(stored_bar, closes):
+    # Did the source's close for our last stored day change since we stored it?
+    day, stored_close = stored_bar
+    fresh = closes.get(pd.Timestamp(day))
+    return fresh is not None and not np.isclose(float(fresh), stored_close, rtol=OVERLAP_TOLERANCE, atol=0)
+
+def update_price_store(price_store, price_source, tickers, max_workers=8, timeout=10, retries=2):
     """
-    Downloads data ONLY for market-linked schemes.
+    Incremental fetch: ask the source for bars from each ticker's last
+    stored date on and append the new ones. Returns the FetchSummary.
+
+    yfinance closes are split/dividend adjusted, so an old stored history
+    and new bars can be on different adjustments. The last stored bar is
+    fetched again as an overlap: if its close changed, the ticker's full
+    history is refetched and the file replaced - otherwise a split would
+    show up as a -50% daily return in every feature from then on.
     """
-    try:
-        data = yf.Ticker(ticker).history(period="3y")
-        if data.empty: return None
-        daily_returns = data['Close'].pct_change().dropna()
-        # Handle potential cases where std dev is zero (e.g., LIQUIDBEES sometimes)
-        if daily_returns.std() == 0:
-            volatility = 0.001 # Assign a very small volatility
-            sharpe_ratio = 0 # Cannot calculate sharpe if std dev is zero
-        else:
-            volatility = daily_returns.std() * np.sqrt(252)
-            sharpe_ratio = (daily_returns.mean() / daily_returns.std()) * np.sqrt(252)
+    today = datetime.date.today()
+    stored = {}
+    for ticker in tickers:
+        bar = price_store.last_bar(ticker)
+        if bar is not None:
+            stored[ticker] = bar
+    starts = {ticker: day for ticker, (day, _) in stored.items()}
+    # Already up to date -> nothing to ask the source for
+    pending = [t for t in tickers if t not in starts or starts[t] < today]
+    new_bars, summary = fetch_closes(
+        price_source, pending, starts=starts, max_workers=max_workers, timeout=timeout, retries=retries)
+    readjusted = [t for t, closes in new_bars.items() if t in stored and _readjusted(stored[t], closes)]
+    added = 0
+    for ticker, closes in new_bars.items():
+        if ticker not in readjusted:
+            added += price_store.append(ticker, closes)
+    if readjusted:
+        print(f"  > Price store: adjusted closes changed for {len(readjusted)} tickers, refetching full history")
+        full, refetch_summary = fetch_closes(
+            price_source, readjusted, max_workers=max_workers, timeout=timeout, retries=retries)
+        for ticker, closes in full.items():
+            price_store.replace(ticker, closes)
+        # Refetch failed -> file left as it was (no new bars) and reported as failed
+        summary.failed.update(refetch_summary.failed)
+        summary.failed.update({t: "no data on full refetch" for t in refetch_summary.empty})
+        summary.retries += refetch_summary.retries
+        summary.fetched = [t for t in summary.fetched if t not in summary.failed]
+    print(f"  > Price store: {added} new bars for {len(new_bars) - len(readjusted)} tickers, "
+          f"{len(readjusted)} rewritten ({len(tickers) - len(pending) + len(summary.up_to_date)} already up to date)")
+    return summary
+
+def assign_final_label(scheme, market_label=None):
+    """Hybrid rules: manual labels for safe categories, AI market label for the rest."""
+    final_label = "Medium" # Default label
+
+    # Rule 1: Manual Labels for Safest Categories
+    if scheme['category'] in ['Fixed Deposit', 'Liquid Debt']:
+        final_label = "Very Low"
+    elif scheme['category'] == 'Gold Bond': # SGB
+         final_label = "Very Low" # Government backed
+    elif scheme['category'] == 'Gold ETF':
+         final_label = "Low" # Gold is less volatile than equity
+
+    # Rule 2: Use AI Labels for Market-Linked Categories
+    elif market_label == "High-M":
+        final_label = "High"
+    elif market_label == "Medium-M":
+        final_label = "Medium"
+    elif market_label == "Low-M": # AI's low volatility market items
+         final_label = "Low" # Assign final "Low"
+
+    # Rule 3: Category based override for High risk (if AI misses)
+    if 'Small-Cap' in scheme['category'] or 'Sectoral' in scheme['category']:
+         final_label = "High" # Always consider these high risk
+    return final_label
+
+def build_allocation_model(labeled_schemes, risk_features, tickers, covariance, schemes_version):
+    """
+    Expected returns + annualized covariance for every labeled scheme, and
+    the optimizer's weights per risk profile. Market schemes use their 3y
+    avg_return and the price covariance; manual ones (FD, SGB) their
+    avg_return and volatility, uncorrelated with the rest.
+    """
+    position = {t: i for i, t in enumerate(tickers)}
+    market = [s for s in labeled_schemes if s['ticker'] in risk_features.index and s['ticker'] in position
+              and np.isfinite(covariance[position[s['ticker']], position[s['ticker']]])]
+    manual = [s for s in labeled_schemes if s['ticker'] not in position and 'avg_return' in s]
+    rows = [position[s['ticker']] for s in market]
+
+    n = len(market) + len(manual)
+    cov = np.zeros((n, n))
+    cov[:len(market), :len(market)] = covariance[np.ix_(rows, rows)]
+    for i, scheme in enumerate(manual, start=len(market)):
+        cov[i, i] = scheme.get('volatility', 0.0) ** 2
+    mu = np.array([float(risk_features.loc[s['ticker'], 'avg_return']) for s in market]
+                  + [float(s['avg_return']) for s in manual])
+    ordered = market + manual
+    return {
+        "schemes_version": schemes_version,
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "tickers": [s['ticker'] for s in ordered],
+        "expected_returns": np.round(mu, 10).tolist(),
+        "covariance": np.round(cov, 10).tolist(),
+        "profiles": optimize_profiles([s['ticker'] for s in ordered], mu, cov, [s['risk_label'] for s in ordered]),
+    }
 
-        return {"ticker": ticker, "volatility": volatility, "sharpe_ratio": sharpe_ratio}
-    except Exception as e:
-        print(f"  > Error or no data for {ticker}: {e}")
-        return None
+def _end_stage(stage, began):
+    now = time.perf_counter()
+    JOB_STAGE_SECONDS.observe(now - began, stage)
+    return now
 
-def run_ai_labeling_job():
+def run_ai_labeling_job(price_source=None, max_workers=8, timeout=10, retries=2, store_dir=PRICE_STORE_DIR,
+                        refit=False, cluster_mode="auto", model_dir=MODEL_DIR, schemes_path=None):
+    """
+    `price_source` defaults to yfinance; pass a FilePriceSource to run offline.
+    Market data is fetched in parallel (bounded pool, per-ticker timeout +
+    retries); tickers that fail are listed in the fetch summary.
+    With `store_dir` set (default), only new bars are fetched and appended to
+    the local PriceStore, and features are computed from its mapped files.
+    `store_dir=None` fetches the full window every run instead.
+    Labels come from the saved RiskClusterModel; it is only (re)fitted when
+    none exists, its features changed, or `refit=True`.
+    With `schemes_path`, the covariance matrix and the optimizer's per-profile
+    weights are written next to it (see build_allocation_model) - the caller
+    still writes the returned JSON to `schemes_path` itself.
+    """
     print("--- Starting AI Data Preparation Job v2.0 ---")
+    price_source = price_source or YFinancePriceSource()
     schemes = get_all_scheme_types()
     all_scheme_data = []
     market_linked_schemes = []
 
-    print("Step 1: Processing all schemes...")
+    market_tickers = [s['ticker'] for s in schemes if s["has_market_data"]]
+    stage_began = time.perf_counter()
+    print(f"Step 0: Fetching prices for {len(market_tickers)} tickers from '{price_source.name}'...")
+    if store_dir:
+        price_store = PriceStore(store_dir)
+        fetch_summary = update_price_store(
+            price_store, price_source, market_tickers, max_workers=max_workers, timeout=timeout, retries=retries)
+        # Memmap views over the last 5 years - no copy of the stored history
+        closes_by_ticker = {t: price_store.rows(t, days=HISTORY_DAYS) for t in market_tickers}
+        closes_by_ticker = {t: rows for t, rows in closes_by_ticker.items() if len(rows)}
+    else:
+        closes_by_ticker, fetch_summary = fetch_closes(
+            price_source, market_tickers, max_workers=max_workers, timeout=timeout, retries=retries)
+
+    stage_began = _end_stage("fetch", stage_began)
+
+    print(f"Step 1: Computing risk features for {len(closes_by_ticker)} tickers (1y/3y/5y windows)...")
+    aligned = align_closes(closes_by_ticker)
+    risk_features = compute_risk_features(*aligned)
+    stage_began = _end_stage("features", stage_began)
+    # Tickers without enough history for the main (3y) window are skipped
+    risk_features = risk_features.dropna(subset=AI_FEATURES)
+
     for scheme in schemes:
         if scheme["has_market_data"]:
-            features = get_scheme_features(scheme['ticker'])
-            if features:
+            if scheme['ticker'] in risk_features.index:
+                row = risk_features.loc[scheme['ticker']]
+                features = {"ticker": scheme['ticker'], "volatility": float(row['volatility']),
+                            "sharpe_ratio": float(row['sharpe_ratio'])}
                 full_data = {**scheme, **features}
                 market_linked_schemes.append(full_data) # Keep market data separate for AI
                 all_scheme_data.append(full_data)
                 print(f"  > [Market Data] Processed {scheme['scheme_name']}")
-            else:
-                # If market data fails for a market scheme, skip it
-                 print(f"  > [Market Data] Skipped {scheme['scheme_name']} due to data issues.")
+            # else: missing/failed tickers are reported in fetch_summary
         else:
             # For non-market schemes, use manual data if available
             manual_features = {
@@ -100,27 +241,28 @@ def run_ai_labeling_job():
          print("No market-linked data to run AI model. Exiting.")
          return None
 
-    df_market = pd.DataFrame(market_linked_schemes)
-    df_market.dropna(inplace=True)
-
-    print(f"\nStep 2: Running K-Means AI Model on {len(df_market)} Market-Linked Schemes...")
-    features_for_ai = df_market[['volatility', 'sharpe_ratio']]
-    scaler = StandardScaler()
-    scaled_features = scaler.fit_transform(features_for_ai)
-    kmeans = KMeans(n_clusters=3, random_state=42, n_init=10) # 3 clusters for market data: Low-M, Med-M, High-M
-    df_market['cluster'] = kmeans.fit_predict(scaled_features)
+    stage_began = time.perf_counter()
+    df_market = pd.DataFrame(market_linked_schemes)[['ticker']]
+    # Full feature set (all windows) straight from the engine; AI_FEATURES picks what K-Means sees
+    df_market = df_market.join(risk_features, on='ticker')
+    df_market.dropna(subset=AI_FEATURES, inplace=True)
 
-    print("  > AI Model complete. Analyzing market clusters...")
-    cluster_volatility = df_market.groupby('cluster')['volatility'].mean().sort_values()
-
-    # Map market clusters: Low-Market, Medium-Market, High-Market
-    market_cluster_mapping = {
-        cluster_volatility.index[0]: "Low-M",
-        cluster_volatility.index[1]: "Medium-M",
-        cluster_volatility.index[2]: "High-M"
-    }
-    df_market['market_risk_label'] = df_market['cluster'].map(market_cluster_mapping)
-    print(f"  > Market Cluster mapping: {market_cluster_mapping}")
+    model = None if refit else RiskClusterModel.load_latest(model_dir)
+    if model is not None and model.features != AI_FEATURES:
+        print(f"  > Saved model v{model.version} uses {model.features}, refitting for {AI_FEATURES}")
+        model = None
+    if model is None:
+        previous = RiskClusterModel.load_latest(model_dir)
+        version = previous.version + 1 if previous else 1
+        print(f"\nStep 2: Fitting K-Means AI Model ({cluster_mode}) on {len(df_market)} Market-Linked Schemes...")
+        model = RiskClusterModel.fit(df_market, AI_FEATURES, mode=cluster_mode, version=version)
+        print(f"  > AI Model complete. Saved as {model.save(model_dir)}")
+    else:
+        print(f"\nStep 2: Using saved AI Model v{model.version} ({model.algorithm}, fitted {model.fitted_at})")
+    # Nearest-centroid predict - same clusters/labels as the last fit, no re-clustering
+    df_market['market_risk_label'] = model.predict(df_market)
+    print(f"  > Market Cluster mapping: {model.mapping}")
+    stage_began = _end_stage("cluster", stage_began)
 
     # --- Step 3: Final Labeling (Hybrid Approach) ---
     print("\nStep 3: Assigning Final Risk Labels...")
@@ -128,30 +270,8 @@ def run_ai_labeling_job():
     market_labeled_dict = df_market.set_index('ticker')['market_risk_label'].to_dict()
 
     for scheme in all_scheme_data:
-        final_label = "Medium" # Default label
-
-        # Rule 1: Manual Labels for Safest Categories
-        if scheme['category'] in ['Fixed Deposit', 'Liquid Debt']:
-            final_label = "Very Low"
-        elif scheme['category'] == 'Gold Bond': # SGB
-             final_label = "Very Low" # Government backed
-        elif scheme['category'] == 'Gold ETF':
-             final_label = "Low" # Gold is less volatile than equity
-
-        # Rule 2: Use AI Labels for Market-Linked Categories
-        elif scheme['has_market_data'] and scheme['ticker'] in market_labeled_dict:
-            market_label = market_labeled_dict[scheme['ticker']]
-            if market_label == "High-M":
-                final_label = "High"
-            elif market_label == "Medium-M":
-                final_label = "Medium"
-            elif market_label == "Low-M": # AI's low volatility market items
-                 final_label = "Low" # Assign final "Low"
-
-        # Rule 3: Category based override for High risk (if AI misses)
-        if 'Small-Cap' in scheme['category'] or 'Sectoral' in scheme['category']:
-             final_label = "High" # Always consider these high risk
-
+        market_label = market_labeled_dict.get(scheme['ticker']) if scheme['has_market_data'] else None
+        final_label = assign_final_label(scheme, market_label)
         scheme['risk_label'] = final_label
         # Clean up temporary fields before saving
         scheme.pop('has_market_data', None)
@@ -162,18 +282,54 @@ def run_ai_labeling_job():
 
         final_labeled_schemes.append(scheme)
         print(f"  > Labeled '{scheme['scheme_name']}' as '{final_label}'")
+    stage_began = _end_stage("label", stage_began)
 
-    print("\n--- AI Data Preparation Job v2.0 Complete ---")
+    print(f"\nMarket data: {len(market_linked_schemes)}/{len(market_tickers)} tickers labeled, "
+          f"{len(fetch_summary.failed)} fetch failures (details in log)")
     final_schemes_json = json.dumps(final_labeled_schemes, indent=4) # Pretty print directly
+
+    if schemes_path:
+        print("\nStep 4: Optimizing portfolios on the efficient frontier...")
+        allocation_model = build_allocation_model(
+            final_labeled_schemes, risk_features, aligned[1], returns_covariance(*aligned),
+            content_version(final_schemes_json.encode()))
+        for profile, result in allocation_model["profiles"].items():
+            print(f"  > {profile}: return {result['expected_return']:.1%}, volatility {result['volatility']:.1%}, "
+                  f"{result['weights']}")
+        write_allocation_model(allocation_model, schemes_path)
+        _end_stage("optimize", stage_began)
+
+    print("\n--- AI Data Preparation Job v2.0 Complete ---")
     return final_schemes_json
 
 if __name__ == "__main__":
-    final_schemes_json = run_ai_labeling_job()
+    parser = argparse.ArgumentParser(description="Fetch prices, label schemes, write schemes_master_list_v2.json")
+    parser.add_argument("--prices-dir", help="Offline mode: read <ticker>.csv files from this folder instead of yfinance")
+    parser.add_argument("--workers", type=int, default=8, help="Parallel price fetches")
+    parser.add_argument("--timeout", type=float, default=10, help="Per-ticker fetch timeout (seconds)")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per ticker")
+    parser.add_argument("--store-dir", default=PRICE_STORE_DIR, help="Local price history folder (incremental fetch)")
+    parser.add_argument("--no-store", action="store_true", help="Skip the local store, fetch the full 3y window")
+    parser.add_argument("--refit", action="store_true", help="Refit the clustering model instead of reusing the saved one")
+    parser.add_argument("--cluster-mode", choices=["auto", "kmeans", "minibatch"], default="auto",
+                        help="Clustering algorithm for a refit (auto = MiniBatchKMeans for large universes)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+    from scheme_refresher import RelabelLock
+    if not RelabelLock(SCHEMES_FILE).acquire():
+        # A server with SCHEME_RELABEL_SECONDS is already relabeling - don't race it on price_history/
+        raise SystemExit("Another process is relabeling the scheme file, not starting a second job.")
+
+    source = FilePriceSource(args.prices_dir) if args.prices_dir else YFinancePriceSource()
+    final_schemes_json = run_ai_labeling_job(source, max_workers=args.workers, timeout=args.timeout, retries=args.retries,
+                                             store_dir=None if args.no_store else args.store_dir,
+                                             refit=args.refit, cluster_mode=args.cluster_mode,
+                                             schemes_path=SCHEMES_FILE)
     if final_schemes_json:
         print("\nFinal JSON Output (Saved to schemes_master_list_v2.json):")
         print(final_schemes_json)
 
-        # Save to a NEW file to avoid overwriting the old one
-        with open("schemes_master_list_v2.json", "w") as f:
-            f.write(final_schemes_json)
+        # Atomic write - a running server's SchemeRefresher picks it up without restart
+        write_schemes_file(final_schemes_json, SCHEMES_FILE)
         print("\nSuccessfully saved output to 'schemes_master_list_v2.json'")
\ No newline at end of file
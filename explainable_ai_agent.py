@@ -1,10 +1,34 @@
 # explainable_ai_agent.py
+import threading
+
+# Rule 2 text - only the Sharpe value changes between funds in the same bucket
+SHARPE_REASONS = {
+    "excellent": "Excellent Risk-Adjusted Return (Sharpe: {:.2f})",
+    "good": "Good Risk-Adjusted Return (Sharpe: {:.2f})",
+}
+
+def sharpe_bucket(sharpe):
+    if sharpe > 1.2: return "excellent"
+    if sharpe > 0.8: return "good"
+    return None
+
 class ExplainableAIAgent:
-    def run(self, fund_data, user_profile):
+    """
+    Reasons depend only on (risk_label, category, user_profile, sharpe bucket),
+    so the rule chain runs once per distinct key and is kept in `_rules` as
+    reason templates. With a snapshot, finished explanations are also kept
+    per snapshot version (last KEEP_GENERATIONS), so a fund explained once is
+    a dict lookup afterwards.
+    """
+    KEEP_GENERATIONS = 2
+
+    def __init__(self):
+        self._rules = {} # (risk, category, user_profile, bucket) -> tuple of reason templates
+        self._explanations = {} # snapshot version -> {(scheme_name, ticker, user_profile): tuple of reasons}
+        self._lock = threading.Lock()
+
+    def _compile(self, risk, category, user_profile, bucket):
         reasons = []
-        sharpe = fund_data.get('sharpe_ratio', 0) # Use .get for safety
-        risk = fund_data.get('risk_label', 'Medium')
-        category = fund_data.get('category', '')
 
         # Rule 1: Safety (FD, SGB, Liquid)
         if risk == "Very Low":
@@ -14,11 +38,10 @@ class ExplainableAIAgent:
                   reasons.append("Government Backed + Gold Exposure (SGB)")
              elif 'Liquid' in category:
                   reasons.append("Very Safe for Short Term Parking")
-             return reasons[:2] # Very Low risk ku safety reason pothum
+             return tuple(reasons[:2]) # Very Low risk ku safety reason pothum
 
-        # Rule 2: Sharpe Ratio
-        if sharpe > 1.2: reasons.append(f"Excellent Risk-Adjusted Return (Sharpe: {sharpe:.2f})")
-        elif sharpe > 0.8: reasons.append(f"Good Risk-Adjusted Return (Sharpe: {sharpe:.2f})")
+        # Rule 2: Sharpe Ratio (formatted with the fund's value later)
+        if bucket: reasons.append(SHARPE_REASONS[bucket])
 
         # Rule 3: Matching Profile
         if risk == 'Low' and user_profile in ["Conservative", "Moderate"]: reasons.append("Provides Stability & Lower Risk")
@@ -32,4 +55,62 @@ class ExplainableAIAgent:
         if 'Large-Cap' in category: reasons.append("Invests in Stable Large Companies")
 
         if not reasons: reasons.append("A solid choice for diversification")
-        return reasons[:2]
\ No newline at end of file
+        return tuple(reasons[:2])
+
+    def _explain(self, fund_data, user_profile):
+        sharpe = fund_data.get('sharpe_ratio', 0) # Use .get for safety
+        risk = fund_data.get('risk_label', 'Medium')
+        category = fund_data.get('category', '')
+        bucket = None if risk == "Very Low" else sharpe_bucket(sharpe)
+        key = (risk, category, user_profile, bucket)
+        templates = self._rules.get(key)
+        if templates is None:
+            templates = self._rules[key] = self._compile(*key)
+        if bucket is None:
+            return templates
+        # Rule 2 is always the first reason when there is a bucket
+        return (templates[0].format(sharpe),) + templates[1:]
+
+    def _memo_for(self, snapshot):
+        memo = self._explanations.get(snapshot.version)
+        if memo is None:
+            with self._lock:
+                memo = self._explanations.get(snapshot.version)
+                if memo is None:
+                    # Copy-and-assign, oldest generation dropped
+                    explanations = dict(self._explanations)
+                    memo = explanations[snapshot.version] = {}
+                    while len(explanations) > self.KEEP_GENERATIONS:
+                        del explanations[next(iter(explanations))]
+                    self._explanations = explanations
+        return memo
+
+    def run(self, fund_data, user_profile, snapshot=None):
+        """Up to two reasons for `fund_data`. Pass the snapshot it came from to memoize."""
+        if snapshot is None:
+            return list(self._explain(fund_data, user_profile))
+        memo = self._memo_for(snapshot)
+        key = (fund_data.get('scheme_name'), fund_data.get('ticker'), user_profile)
+        reasons = memo.get(key)
+        if reasons is None:
+            reasons = memo[key] = self._explain(fund_data, user_profile)
+        return list(reasons)
+
+    def explain_many(self, funds, user_profile, snapshot=None):
+        """run() for a whole shortlist; returns one reasons list per fund, same order."""
+        if snapshot is None:
+            return [list(self._explain(fund, user_profile)) for fund in funds]
+        memo = self._memo_for(snapshot)
+        explained = []
+        for fund in funds:
+            key = (fund.get('scheme_name'), fund.get('ticker'), user_profile)
+            reasons = memo.get(key)
+            if reasons is None:
+                reasons = memo[key] = self._explain(fund, user_profile)
+            explained.append(list(reasons))
+        return explained
+
+    def warm(self, snapshot):
+        # Every shortlisted fund explained up front - shortlists with reasons are lookups from here
+        for user_profile, funds in snapshot.index.shortlists.items():
+            self.explain_many(funds, user_profile, snapshot)
@@ -0,0 +1,46 @@
+# gunicorn.conf.py - picked up automatically by `gunicorn app:app`
+#
+#   gunicorn app:app                      # PORT / WEB_CONCURRENCY / GUNICORN_THREADS from env
+#
+# The scheme snapshot, agents and pre-encoded responses are loaded ONCE in
+# the master (create_app), frozen out of the GC, then forked: workers boot
+# instantly, share those pages copy-on-write and answer the first request
+# from a warm cache. GET /ready turns 200 once that is done.
+import gc
+import logging
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = 30
+# Bound the queues in front of the app too: at most 2x threads connections per
+# worker (the admission limiters in app.py are sized from the same thread count),
+# and a short kernel accept backlog - past that clients get refused quickly
+# instead of waiting for a worker timeout
+worker_connections = threads * 2
+backlog = int(os.environ.get("GUNICORN_BACKLOG", 64))
+preload_app = True # import app.py in the master, before fork
+
+# App modules log through `logging` (startup, snapshot swaps, refresh failures) - send
+# them to stderr next to gunicorn's own log, same as `python app.py` does
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+def when_ready(server):
+    # Master, after preload, before the first fork
+    import app as backend
+    backend.create_app(start_refresher=False)
+    if not backend.is_ready():
+        server.log.warning("Scheme data not loaded - /ready will answer 503")
+    # Move everything loaded so far to the permanent generation: the collector
+    # never writes to those objects again, so the shared pages stay shared
+    gc.collect()
+    gc.freeze()
+    server.log.info("Preloaded scheme snapshot; %d objects frozen before fork", gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    import app as backend
+    backend.after_fork()
@@ -0,0 +1,111 @@
+# password_hasher.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """Pool is saturated (or too slow) - caller should answer 503 and retry later."""
+
+
+# Run inside the worker processes - module level so they pickle
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+def _check_password(password_hash, password):
+    return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing/verification in a small dedicated process pool, so the
+    ~100ms of CPU per call never runs on a request thread (or holds the GIL
+    for the portfolio endpoints).
+
+    At most `max_pending` calls can be queued or running; beyond that
+    `HasherBusy` is raised straight away instead of queueing. A call that
+    doesn't finish within `timeout` seconds also raises HasherBusy.
+
+    Workers are started with forkserver (spawn where that's missing), not
+    fork: the caller is a threaded server process, and a fork there copies
+    whatever locks other threads held. If a worker dies (OOM kill, ...) the
+    pool is broken for good, so it is thrown away and rebuilt; the call that
+    hit it gets HasherBusy.
+    """
+    def __init__(self, rounds=12, workers=2, max_pending=8, timeout=5.0):
+        self.rounds = rounds
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        # Created lazily and per process - a pool inherited over fork() is unusable
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._pool_lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _discard_pool(self, pool):
+        # Only the pool that broke - another thread may already have replaced it
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("password hashing queue is full")
+        pool = self._get_pool()
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._discard_pool(pool)
+            raise HasherBusy("password hashing pool restarted")
+        except Exception:
+            self._slots.release()
+            raise
+        # Slot frees when the work is really done, even if we stop waiting earlier
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HasherBusy("password hashing timed out")
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise HasherBusy("password hashing pool restarted")
+
+    def hash(self, password):
+        return self._run(_hash_password, password, self.rounds)
+
+    def check(self, password_hash, password):
+        if not password_hash or password is None:
+            return False
+        return self._run(_check_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the stored hash was made with a different cost factor."""
+        try:
+            return int(password_hash.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def shutdown(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
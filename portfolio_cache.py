@@ -0,0 +1,95 @@
+# portfolio_cache.py
+import json
+import threading
+import time
+
+from metrics import REGISTRY
+
+CACHE_BUILD_SECONDS = REGISTRY.histogram(
+    "portfolio_cache_build_seconds", "Time to build one snapshot's response table")
+CACHE_MISSES = REGISTRY.counter(
+    "portfolio_cache_misses_total", "Lookups that had to build a table on the request path")
+
+
+class PortfolioResponseCache:
+    """
+    Pre-serialized /generate_portfolio responses.
+
+    UserProfileAgent only looks at (Quiz_Answer_1, Quiz_Answer_2, horizon),
+    so the whole input space is UserProfileAgent.QUIZ_SPACE. `warm()` builds
+    the response for every distinct risk profile once, encodes it to JSON
+    bytes and maps every quiz key to those bytes. A request is then
+    normalize -> dict lookup -> write bytes.
+
+    Tables are keyed by the snapshot version they were built from; a
+    lookup against an unknown snapshot builds its table first, so stale
+    entries are never served. The previous generation is kept too, so
+    requests still pinned to the old snapshot during a swap don't force
+    a rebuild.
+
+    Alongside every body it keeps a compact single-line encoding
+    (`get_line`) for the NDJSON batch endpoint - /generate_portfolio may
+    pretty-print, an NDJSON record must not contain newlines.
+    """
+    KEEP_GENERATIONS = 2
+
+    def __init__(self, profile_agent, build_response, encode, encode_line=None):
+        self.profile_agent = profile_agent
+        self.build_response = build_response # (risk_profile, snapshot) -> (dict, status)
+        self.encode = encode # dict -> bytes
+        self.encode_line = encode_line or (lambda obj: json.dumps(obj).encode()) # dict -> one-line bytes
+        self._tables = {} # snapshot version -> {quiz_key: (body, status)}
+        self._lines = {} # snapshot version -> {quiz_key: (line, status)}
+        self._lock = threading.Lock()
+
+    def warm(self, snapshot):
+        with self._lock:
+            if snapshot.version in self._tables:
+                return self._tables[snapshot.version]
+            began = time.perf_counter()
+            by_profile = {}
+            entries = {}
+            lines = {}
+            for quiz_key in self.profile_agent.QUIZ_SPACE:
+                q1, q2, horizon = quiz_key
+                risk_profile = self.profile_agent.run({"Quiz_Answer_1": q1, "Quiz_Answer_2": q2, "horizon": horizon})
+                if risk_profile not in by_profile:
+                    response, status = self.build_response(risk_profile, snapshot)
+                    by_profile[risk_profile] = ((self.encode(response), status),
+                                                (self.encode_line(response), status))
+                entries[quiz_key], lines[quiz_key] = by_profile[risk_profile]
+            # Copy-and-assign - readers never see a dict being resized.
+            # _lines first: a reader that finds the version in _tables finds it here too
+            self._lines = self._keep_recent(self._lines, snapshot.version, lines)
+            self._tables = self._keep_recent(self._tables, snapshot.version, entries)
+            CACHE_BUILD_SECONDS.observe(time.perf_counter() - began)
+            return entries
+
+    def _keep_recent(self, tables, version, entries):
+        tables = dict(tables)
+        tables[version] = entries
+        while len(tables) > self.KEEP_GENERATIONS:
+            del tables[next(iter(tables))]
+        return tables
+
+    def peek(self, quiz_key, snapshot):
+        """(body_bytes, status) if this snapshot's table is built, else None - never builds."""
+        entries = self._tables.get(snapshot.version)
+        return None if entries is None else entries[quiz_key]
+
+    def get(self, quiz_key, snapshot):
+        """Returns (body_bytes, status) for a normalized quiz key."""
+        entries = self._tables.get(snapshot.version)
+        if entries is None:
+            CACHE_MISSES.inc()
+            entries = self.warm(snapshot)
+        return entries[quiz_key]
+
+    def get_line(self, quiz_key, snapshot):
+        """Returns (one_line_body_bytes, status) - same response as get(), no newlines."""
+        lines = self._lines.get(snapshot.version)
+        if lines is None:
+            CACHE_MISSES.inc()
+            self.warm(snapshot)
+            lines = self._lines[snapshot.version]
+        return lines[quiz_key]
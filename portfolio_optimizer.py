@@ -0,0 +1,127 @@
+# portfolio_optimizer.py
+"""
+Offline mean-variance optimizer. data_preparation runs it after labeling
+and stores the result next to the scheme file; requests only look the
+weights up (see SchemeSnapshot.allocations).
+
+Long-only, fully invested, at most MAX_WEIGHT per scheme. Each frontier
+point solves  max  mu.w - (risk_aversion / 2) w'.cov.w  by projected
+gradient (FISTA) - plain NumPy, small universes converge in a few ms.
+"""
+import numpy as np
+
+MAX_WEIGHT = 0.4 # no single scheme above 40%
+MIN_WEIGHT = 0.05 # positions smaller than this are dropped and the rest re-solved
+MAX_CANDIDATES = 200 # per profile, best mu/vol first - keeps cov small for big universes
+RISK_AVERSIONS = tuple(np.logspace(3, -1, 30)) # high -> low, i.e. min variance -> max return
+
+# profile -> (risk labels it may hold, target annual volatility)
+PROFILE_TARGETS = {
+    "Aggressive": (("High", "Medium", "Low", "Very Low"), 0.18),
+    "Moderate": (("Medium", "Low", "Very Low"), 0.10),
+    "Conservative": (("Low", "Very Low"), 0.05),
+    "Very Conservative": (("Very Low",), 0.02),
+}
+
+
+def project_capped_simplex(v, cap):
+    """Euclidean projection onto {w : 0 <= w <= cap, sum(w) = 1}."""
+    cap = max(cap, 1.0 / len(v)) # otherwise infeasible
+    # sum(clip(v - shift, 0, cap)) is piecewise linear and decreasing in shift,
+    # with kinks at v and v - cap: find the segment that crosses 1, interpolate
+    kinks = np.sort(np.concatenate((v - cap, v)))
+    totals = np.clip(v[None, :] - kinks[:, None], 0, cap).sum(axis=1)
+    i = np.searchsorted(-totals, -1.0) # first kink with total <= 1
+    if i == 0:
+        shift = kinks[0]
+    else:
+        left, right = totals[i - 1], totals[i]
+        shift = kinks[i - 1] + (left - 1) / (left - right) * (kinks[i] - kinks[i - 1]) if left != right else kinks[i]
+    w = np.clip(v - shift, 0, cap)
+    return w / w.sum()
+
+
+def solve(mu, cov, risk_aversion, cap=MAX_WEIGHT, start=None, iterations=5000, tolerance=1e-9):
+    n = len(mu)
+    # Lipschitz constant of the gradient; riskless-only universes fall back to a big step
+    lipschitz = risk_aversion * (np.linalg.eigvalsh(cov)[-1] if n else 0)
+    step = 1.0 / lipschitz if lipschitz > 1e-9 else 1e3
+    w = project_capped_simplex(np.full(n, 1.0 / n) if start is None else start, cap)
+    y, t = w, 1.0
+    for _ in range(iterations):
+        gradient = risk_aversion * (cov @ y) - mu
+        w_next = project_capped_simplex(y - step * gradient, cap)
+        if np.abs(w_next - w).max() < tolerance:
+            return w_next
+        if (y - w_next) @ (w_next - w) > 0:
+            # Momentum points uphill - restart it (adaptive restart, no oscillation)
+            y, w, t = w_next, w_next, 1.0
+            continue
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        y = w_next + (t - 1) / t_next * (w_next - w)
+        w, t = w_next, t_next
+    return w
+
+
+def efficient_frontier(mu, cov, cap=MAX_WEIGHT):
+    """[(risk_aversion, weights, expected_return, volatility)] from min variance to max return."""
+    points = []
+    w = None
+    for risk_aversion in RISK_AVERSIONS:
+        w = solve(mu, cov, risk_aversion, cap, start=w)
+        points.append((risk_aversion, w, float(mu @ w), float(np.sqrt(max(w @ cov @ w, 0)))))
+    return points
+
+
+def _pick(points, target_volatility):
+    # Highest return within the volatility target; min-variance point if none fits
+    within = [p for p in points if p[3] <= target_volatility + 1e-9]
+    return max(within, key=lambda p: p[2]) if within else points[0]
+
+
+def _sparse(tickers, weights):
+    return {tickers[i]: round(float(weights[i]), 6) for i in np.flatnonzero(weights > 1e-6)}
+
+
+def optimize_profile(tickers, mu, cov, target_volatility, cap=MAX_WEIGHT):
+    points = efficient_frontier(mu, cov, cap)
+    risk_aversion, w, _, _ = _pick(points, target_volatility)
+    keep = w >= MIN_WEIGHT
+    if not keep.all() and keep.any():
+        # Re-solve on the survivors so the dropped crumbs don't just get scaled up
+        kept = np.flatnonzero(keep)
+        w = np.zeros_like(w)
+        w[kept] = solve(mu[kept], cov[np.ix_(kept, kept)], risk_aversion, cap)
+    return {
+        "risk_aversion": float(risk_aversion),
+        "expected_return": round(float(mu @ w), 6),
+        "volatility": round(float(np.sqrt(max(w @ cov @ w, 0))), 6),
+        "weights": _sparse(tickers, w),
+        "frontier": [{"expected_return": round(r, 6), "volatility": round(v, 6)} for _, _, r, v in points],
+    }
+
+
+def optimize_profiles(tickers, mu, cov, risk_labels, targets=PROFILE_TARGETS, cap=MAX_WEIGHT):
+    """
+    Optimal weights per risk profile over the schemes that profile may hold.
+    `tickers`, `mu` (annual expected return), `cov` (annualized) and
+    `risk_labels` are aligned. Returns {profile: {...}}; profiles with no
+    eligible scheme are left out.
+    """
+    tickers = list(tickers)
+    mu = np.asarray(mu, dtype=np.float64)
+    cov = np.asarray(cov, dtype=np.float64)
+    risk_labels = np.asarray(risk_labels, dtype=str)
+    volatility = np.sqrt(np.clip(np.diag(cov), 0, None))
+    profiles = {}
+    for profile, (labels, target_volatility) in targets.items():
+        eligible = np.flatnonzero(np.isin(risk_labels, labels))
+        if not len(eligible):
+            continue
+        if len(eligible) > MAX_CANDIDATES:
+            with np.errstate(divide="ignore"):
+                score = np.where(volatility[eligible] > 0, mu[eligible] / volatility[eligible], np.inf)
+            eligible = eligible[np.argsort(-score, kind="stable")[:MAX_CANDIDATES]]
+        profiles[profile] = optimize_profile(
+            [tickers[i] for i in eligible], mu[eligible], cov[np.ix_(eligible, eligible)], target_volatility, cap)
+    return profiles
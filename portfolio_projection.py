@@ -0,0 +1,203 @@
+# portfolio_projection.py
+import math
+import threading
+
+import numpy as np
+
+PERCENTILES = (5, 25, 50, 75, 95)
+DEFAULT_YEARS = 10
+DEFAULT_PATHS = 10000
+MAX_YEARS = 40
+MAX_PATHS = 10000
+PATH_CHUNK = 1000 # paths drawn per pass - bounds the (paths, years, schemes) shock and growth arrays
+VALUES_BUDGET = 4_000_000 # floats per (paths, years + 1, portfolios) values array in project_many - 32 MB
+MAX_HOLDINGS = 50 # distinct schemes per portfolio
+MAX_DRAWS = 20_000_000 # paths x years x schemes per pass - CPU time, memory is bounded by the chunks above
+
+class ProjectionInputs:
+    """
+    Annual expected return vector and covariance for a set of tickers,
+    taken from one scheme snapshot. The optimizer's estimates
+    (snapshot.allocation_model) are used where they exist; otherwise a
+    scheme's own fields: avg_return (FD, SGB) or sharpe_ratio x volatility,
+    with no correlation to the rest.
+    """
+    def __init__(self, snapshot, tickers):
+        self.tickers = tuple(tickers)
+        n = len(self.tickers)
+        self.mu = np.zeros(n)
+        self.cov = np.zeros((n, n))
+        for i, ticker in enumerate(self.tickers):
+            fund = snapshot.by_ticker[ticker]
+            volatility = float(fund.get('volatility') or 0.0)
+            self.mu[i] = float(fund['avg_return']) if 'avg_return' in fund else float(fund.get('sharpe_ratio') or 0.0) * volatility
+            self.cov[i, i] = volatility ** 2
+
+        model = snapshot.allocation_model
+        if model:
+            position = {t: i for i, t in enumerate(model["tickers"])}
+            known = [i for i, t in enumerate(self.tickers) if t in position]
+            if known:
+                rows = [position[self.tickers[i]] for i in known]
+                self.mu[known] = np.asarray(model["expected_returns"])[rows]
+                self.cov[np.ix_(known, known)] = np.asarray(model["covariance"])[np.ix_(rows, rows)]
+
+        # cov = F F' - eigen factor instead of Cholesky: riskless schemes (FD) make cov singular
+        eigenvalues, eigenvectors = np.linalg.eigh(self.cov)
+        self.factor = eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+        # Yearly log drift so that E[gross return] = 1 + mu (an FD at 7% grows exactly 1.07x a year)
+        self.drift = np.log1p(self.mu) - np.diag(self.cov) / 2
+
+
+def normalize_holdings(holdings):
+    """
+    Sorted ((ticker, percent), ...) with float percents - the cache key and
+    the input to the weights. Raises ValueError for a percent that isn't a
+    finite non-negative number, more than MAX_HOLDINGS schemes, or nothing
+    positive to project.
+    """
+    normalized = []
+    for ticker, percent in holdings:
+        try:
+            value = float(percent)
+        except (TypeError, ValueError):
+            raise ValueError(f"Percent for {ticker} must be a number")
+        if not math.isfinite(value) or value < 0:
+            raise ValueError(f"Percent for {ticker} must be a finite, non-negative number")
+        normalized.append((ticker, value))
+    if len({ticker for ticker, _ in normalized}) > MAX_HOLDINGS:
+        raise ValueError(f"At most {MAX_HOLDINGS} schemes per portfolio")
+    if not any(value > 0 for _, value in normalized):
+        raise ValueError("Portfolio has no positive holdings")
+    return tuple(sorted(normalized))
+
+
+def check_budget(years, paths, schemes):
+    # One normal draw (and one exp) per path, year and scheme
+    if years * paths * schemes > MAX_DRAWS:
+        raise ValueError(f"paths x years x schemes must be at most {MAX_DRAWS:,} "
+                         f"(got {paths} x {years} x {schemes}) - ask for fewer paths or portfolios")
+
+
+def portfolio_values(inputs, weights, years, paths, seed):
+    """
+    Value of 1 invested in each portfolio (columns of `weights`, n x P) on
+    `paths` correlated lognormal paths, rebalanced yearly. Returns
+    (paths, years + 1, P), year 0 included.
+
+    Shocks are drawn PATH_CHUNK paths at a time; the generator fills them
+    in order, so the draws are the same as one (paths, years, n) block -
+    same seed, same values, for any chunk size.
+    """
+    rng = np.random.default_rng(seed)
+    values = np.empty((paths, years + 1, weights.shape[1]))
+    values[:, 0] = 1.0
+    for start in range(0, paths, PATH_CHUNK):
+        stop = min(start + PATH_CHUNK, paths)
+        shocks = rng.standard_normal((stop - start, years, len(inputs.tickers)))
+        growth = np.exp(inputs.drift + shocks @ inputs.factor.T) # yearly gross return per scheme
+        np.cumprod(growth @ weights, axis=1, out=values[start:stop, 1:])
+    return values
+
+
+def percentile_bands(values, initial_amount):
+    """values (paths, years + 1, P) -> one {"p5": [...], ...} per portfolio."""
+    # overwrite_input: sorts `values` in place instead of a same-size copy - callers don't reuse it
+    levels = np.percentile(values, PERCENTILES, axis=0, overwrite_input=True) # (len(PERCENTILES), years + 1, P)
+    levels = np.round(levels * initial_amount, 2)
+    return [{f"p{p}": levels[i, :, j].tolist() for i, p in enumerate(PERCENTILES)} for j in range(values.shape[2])]
+
+
+class PortfolioProjector:
+    """
+    Vectorized Monte Carlo projections of portfolio value.
+
+    A run is fully determined by (snapshot version, holdings, years, paths,
+    seed, initial_amount), so results are kept in a small per-snapshot
+    cache; the same request never simulates twice.
+    """
+    CACHE_SIZE = 512
+
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, key, result):
+        with self._lock:
+            if len(self._cache) >= self.CACHE_SIZE:
+                del self._cache[next(iter(self._cache))]
+            self._cache[key] = result
+
+    @staticmethod
+    def _weights(holdings, tickers):
+        # `holdings` already through normalize_holdings
+        position = {t: i for i, t in enumerate(tickers)}
+        weights = np.zeros(len(tickers))
+        for ticker, percent in holdings:
+            weights[position[ticker]] += percent
+        return weights / weights.sum()
+
+    @staticmethod
+    def _results(inputs, weights, values, initial_amount, years, paths, seed, snapshot):
+        # One response dict per column of `weights`
+        expected = inputs.mu @ weights
+        variance = np.einsum("ip,ij,jp->p", weights, inputs.cov, weights)
+        return [
+            {"years": list(range(years + 1)), "paths": paths, "seed": seed, "snapshot": snapshot.version,
+             "expected_return": round(float(expected[j]), 6),
+             "volatility": round(float(np.sqrt(max(variance[j], 0))), 6),
+             "percentiles": bands}
+            for j, bands in enumerate(percentile_bands(values, initial_amount))
+        ]
+
+    @staticmethod
+    def _key(snapshot, holdings, years, paths, seed, initial_amount):
+        return (snapshot.version, normalize_holdings(holdings), years, paths, seed, initial_amount)
+
+    def peek(self, snapshot, holdings, years=DEFAULT_YEARS, paths=DEFAULT_PATHS, seed=0, initial_amount=1.0):
+        """project()'s result if it is already cached, else None - never simulates."""
+        return self._cache.get(self._key(snapshot, holdings, years, paths, seed, initial_amount))
+
+    def project(self, snapshot, holdings, years=DEFAULT_YEARS, paths=DEFAULT_PATHS, seed=0, initial_amount=1.0):
+        """
+        Percentile bands of portfolio value for year 0..years. `holdings` is
+        [(ticker, percent)]; tickers must be in `snapshot`. Raises ValueError
+        for bad holdings (see normalize_holdings) or a run over MAX_DRAWS.
+        """
+        key = self._key(snapshot, holdings, years, paths, seed, initial_amount)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        holdings = key[1]
+        tickers = sorted({ticker for ticker, _ in holdings})
+        check_budget(years, paths, len(tickers))
+        inputs = ProjectionInputs(snapshot, tickers)
+        weights = self._weights(holdings, tickers)[:, None]
+        values = portfolio_values(inputs, weights, years, paths, seed)
+        result, = self._results(inputs, weights, values, initial_amount, years, paths, seed, snapshot)
+        self._remember(key, result)
+        return result
+
+    def project_many(self, snapshot, holdings_list, years=DEFAULT_YEARS, paths=DEFAULT_PATHS, seed=0, initial_amount=1.0):
+        """
+        project() for many portfolios in one pass: one set of correlated draws
+        over the union of their schemes, shared by every portfolio (common
+        random numbers - differences between portfolios aren't sampling noise).
+        Returns one result per entry of `holdings_list`, same order. Raises
+        ValueError if any portfolio is invalid or the union is over MAX_DRAWS.
+        """
+        if not holdings_list:
+            return []
+        holdings_list = [normalize_holdings(holdings) for holdings in holdings_list]
+        tickers = sorted({ticker for holdings in holdings_list for ticker, _ in holdings})
+        check_budget(years, paths, len(tickers))
+        inputs = ProjectionInputs(snapshot, tickers)
+        weights = np.stack([self._weights(holdings, tickers) for holdings in holdings_list], axis=1)
+        results = []
+        batch = max(1, VALUES_BUDGET // (paths * (years + 1))) # portfolios per pass
+        for start in range(0, weights.shape[1], batch):
+            chunk = weights[:, start:start + batch]
+            # Same seed every pass - the same draws again, not kept around between passes
+            values = portfolio_values(inputs, chunk, years, paths, seed)
+            results.extend(self._results(inputs, chunk, values, initial_amount, years, paths, seed, snapshot))
+        return results
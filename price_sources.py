@@ -0,0 +1,159 @@
+# price_sources.py
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class PriceSource:
+    """
+    Where data_preparation gets daily closes from.
+
+    `history(ticker, start=None, timeout=None)` returns a pandas Series of
+    close prices indexed by date, oldest first. `start` (a date) asks only
+    for bars on/after that day. An empty Series means "no data for this
+    ticker" (or, with `start`, nothing new since then); any exception means
+    the fetch failed and may be retried.
+    """
+    name = "base"
+
+    def history(self, ticker, start=None, timeout=None):
+        raise NotImplementedError
+
+
+class YFinancePriceSource(PriceSource):
+    name = "yfinance"
+
+    def __init__(self, period="5y"): # 5y so the longest feature window is filled
+        self.period = period
+
+    def history(self, ticker, start=None, timeout=10):
+        import yfinance as yf # Only needed for live fetches
+        if start is None:
+            data = yf.Ticker(ticker).history(period=self.period, timeout=timeout)
+        else:
+            data = yf.Ticker(ticker).history(start=start, timeout=timeout)
+        if data.empty:
+            return pd.Series(dtype="float64")
+        # Split/dividend adjusted (auto_adjust) - update_price_store refetches a
+        # ticker whose stored history the source has since re-adjusted
+        closes = data['Close']
+        # yfinance gives tz-aware timestamps; store plain dates
+        closes.index = pd.DatetimeIndex(closes.index).tz_localize(None).normalize()
+        return closes
+
+
+class FilePriceSource(PriceSource):
+    """
+    Offline backend: one `<ticker>.csv` per ticker in `directory`, with
+    `Date` and `Close` columns. Used for tests, benchmarks and air-gapped runs.
+    """
+    name = "file"
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path_for(self, ticker):
+        return os.path.join(self.directory, f"{ticker}.csv")
+
+    def history(self, ticker, start=None, timeout=None):
+        path = self.path_for(ticker)
+        if not os.path.exists(path):
+            return pd.Series(dtype="float64")
+        frame = pd.read_csv(path, parse_dates=["Date"], index_col="Date")
+        closes = frame["Close"].sort_index()
+        if start is not None:
+            closes = closes[closes.index >= pd.Timestamp(start)]
+        return closes
+
+
+class FetchSummary:
+    """Outcome of one fetch_closes() run - what worked, what didn't and why."""
+    def __init__(self, source_name, requested):
+        self.source_name = source_name
+        self.requested = requested
+        self.fetched = []
+        self.up_to_date = [] # incremental fetch, nothing new since `start`
+        self.empty = []
+        self.failed = {} # ticker -> last error message
+        self.retries = 0
+        self.elapsed = 0.0
+
+    def as_dict(self):
+        return {
+            "source": self.source_name,
+            "requested": self.requested,
+            "fetched": len(self.fetched),
+            "up_to_date": len(self.up_to_date),
+            "empty": list(self.empty),
+            "failed": dict(self.failed),
+            "retries": self.retries,
+            "elapsed_seconds": round(self.elapsed, 3),
+        }
+
+    def __str__(self):
+        text = (f"[{self.source_name}] fetched {len(self.fetched)}/{self.requested} tickers "
+                f"in {self.elapsed:.1f}s ({self.retries} retries)")
+        if self.up_to_date:
+            text += f"; {len(self.up_to_date)} already up to date"
+        if self.empty:
+            text += f"; no data: {', '.join(self.empty)}"
+        if self.failed:
+            text += "; failed: " + ", ".join(f"{t} ({e})" for t, e in self.failed.items())
+        return text
+
+
+def _fetch_one(source, ticker, start, timeout, retries, backoff):
+    attempt = 0
+    while True:
+        try:
+            return source.history(ticker, start=start, timeout=timeout), attempt, None
+        except Exception as e:
+            if attempt >= retries:
+                return None, attempt, f"{type(e).__name__}: {e}"
+            time.sleep(backoff * (2 ** attempt))
+            attempt += 1
+
+
+def fetch_closes(source, tickers, starts=None, max_workers=8, timeout=10, retries=2, backoff=0.5):
+    """
+    Fetch closes for many tickers in a bounded thread pool.
+
+    `starts` optionally maps ticker -> first date wanted (incremental
+    fetch). `timeout` is handed to the source per request; failed
+    attempts are retried `retries` times with exponential backoff.
+    Returns ({ticker: Series}, FetchSummary). Tickers with no data or
+    failures are left out of the dict and listed in the summary; an empty
+    answer to an incremental fetch counts as up to date, not as no data.
+    """
+    starts = starts or {}
+    summary = FetchSummary(source.name, len(tickers))
+    results = {}
+    began = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers) or 1))) as pool:
+        futures = {
+            ticker: pool.submit(_fetch_one, source, ticker, starts.get(ticker), timeout, retries, backoff)
+            for ticker in tickers
+        }
+        for ticker, future in futures.items():
+            closes, attempts, error = future.result()
+            summary.retries += attempts
+            if error is not None:
+                summary.failed[ticker] = error
+            elif (closes is None or closes.empty) and starts.get(ticker) is not None:
+                summary.up_to_date.append(ticker) # nothing since the last stored bar - not an error
+            elif closes is None or closes.empty:
+                summary.empty.append(ticker)
+            else:
+                results[ticker] = closes
+                summary.fetched.append(ticker)
+    summary.elapsed = time.monotonic() - began
+    if summary.failed or summary.empty:
+        logger.warning("Price fetch summary: %s", summary)
+    else:
+        logger.info("Price fetch summary: %s", summary)
+    return results, summary
@@ -0,0 +1,120 @@
+# price_store.py
+import datetime
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from scheme_snapshot import write_bytes_atomic
+
+PRICE_STORE_DIR = "price_history"
+
+# One fixed-size record per trading day: days since 1970-01-01, close
+RECORD = np.dtype([("date", "<i8"), ("close", "<f8")])
+EMPTY = np.zeros(0, dtype=RECORD)
+
+
+class PriceStore:
+    """
+    Append-only local history of daily closes, one `<ticker>.bin` file per
+    ticker made of RECORDs in date order.
+
+    Files are appended to, or replaced whole by rename, so they can be
+    memory-mapped and read while the job writes new bars. `history()` returns read-only np.memmap
+    views - features are computed straight from the mapped pages without
+    loading or copying the full history.
+    """
+    def __init__(self, root=PRICE_STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, ticker):
+        # Tickers like "PARAGFLEX.NS?" aren't safe file names
+        return os.path.join(self.root, re.sub(r"[^A-Za-z0-9._-]", "_", ticker) + ".bin")
+
+    def _record_count(self, path):
+        try:
+            # Ignore a torn trailing record from an interrupted append
+            return os.path.getsize(path) // RECORD.itemsize
+        except FileNotFoundError:
+            return 0
+
+    def history(self, ticker):
+        """Whole stored history as a read-only structured memmap (fields: date, close)."""
+        path = self.path_for(ticker)
+        count = self._record_count(path)
+        if count == 0:
+            return EMPTY
+        return np.memmap(path, dtype=RECORD, mode="r", shape=(count,))
+
+    def last_bar(self, ticker):
+        """(date, close) of the newest stored bar, or None."""
+        path = self.path_for(ticker)
+        count = self._record_count(path)
+        if count == 0:
+            return None
+        with open(path, "rb") as f:
+            f.seek((count - 1) * RECORD.itemsize)
+            last = np.frombuffer(f.read(RECORD.itemsize), dtype=RECORD)[0]
+        return datetime.date(1970, 1, 1) + datetime.timedelta(days=int(last["date"])), float(last["close"])
+
+    def last_date(self, ticker):
+        bar = self.last_bar(ticker)
+        return None if bar is None else bar[0]
+
+    @staticmethod
+    def _records(closes, after=None):
+        # Series -> RECORDs in date order, only days after `after` (a date)
+        closes = closes.dropna().sort_index()
+        days = pd.DatetimeIndex(closes.index).values.astype("datetime64[D]").astype(np.int64)
+        keep = np.ones(len(days), dtype=bool) if after is None else days > (after - datetime.date(1970, 1, 1)).days
+        # Same day twice in one batch -> keep the later bar
+        keep[:-1] &= days[:-1] != days[1:]
+        records = np.empty(int(keep.sum()), dtype=RECORD)
+        records["date"] = days[keep]
+        records["close"] = closes.values[keep]
+        return records
+
+    def append(self, ticker, closes):
+        """
+        Append bars from a pandas Series of closes (date index). Bars on or
+        before the last stored date are dropped. Returns rows written.
+        """
+        if closes is None or closes.empty:
+            return 0
+        records = self._records(closes, after=self.last_date(ticker))
+        if not len(records):
+            return 0
+        path = self.path_for(ticker)
+        count = self._record_count(path)
+        with open(path, "ab") as f:
+            if f.tell() != count * RECORD.itemsize:
+                f.truncate(count * RECORD.itemsize) # drop a torn record before appending
+                f.seek(0, os.SEEK_END)
+            f.write(records.tobytes())
+        return len(records)
+
+    def replace(self, ticker, closes):
+        """
+        Rewrite a ticker's whole history (e.g. after the source re-adjusted it
+        for a split or dividend). Temp file + rename: memmaps already handed
+        out keep reading the old file. Returns rows written.
+        """
+        records = self._records(closes)
+        write_bytes_atomic(records.tobytes(), self.path_for(ticker))
+        return len(records)
+
+    def rows(self, ticker, days=None):
+        """
+        Stored records as a memmap view, optionally only the last `days`
+        calendar days (same idea as yfinance's period="3y").
+        """
+        rows = self.history(ticker)
+        if days is not None and len(rows):
+            cutoff = rows["date"][-1] - days
+            rows = rows[np.searchsorted(rows["date"], cutoff, side="right"):]
+        return rows
+
+    def closes(self, ticker, days=None):
+        return self.rows(ticker, days)["close"]
@@ -0,0 +1,132 @@
+# risk_features.py
+import warnings
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+# Window name -> trading days (rows of the aligned matrix)
+WINDOWS = {"1y": 252, "3y": 756, "5y": 1260}
+DEFAULT_WINDOW = "3y" # unsuffixed columns (volatility, sharpe_ratio, ...) use this one
+MIN_OBSERVATIONS = 20 # fewer returns than this in a window -> NaN features
+
+FEATURES = ("volatility", "sharpe_ratio", "sortino_ratio", "downside_deviation", "max_drawdown", "avg_return")
+
+
+def as_day_series(closes):
+    """(days since epoch int64, closes float64) from a pandas Series or PriceStore rows."""
+    if isinstance(closes, pd.Series):
+        closes = closes.dropna()
+        days = pd.DatetimeIndex(closes.index).values.astype("datetime64[D]").astype(np.int64)
+        return days, closes.to_numpy(dtype=np.float64)
+    return np.asarray(closes["date"]), np.asarray(closes["close"], dtype=np.float64)
+
+
+def align_closes(closes_by_ticker):
+    """
+    Put every ticker's closes on one date x ticker matrix (NaN where a
+    ticker has no bar). Returns (days, tickers, matrix).
+    """
+    tickers = list(closes_by_ticker)
+    series = [as_day_series(closes_by_ticker[t]) for t in tickers]
+    if not series:
+        return np.zeros(0, dtype=np.int64), tickers, np.zeros((0, 0))
+    all_days = np.concatenate([d for d, _ in series])
+    all_closes = np.concatenate([c for _, c in series])
+    columns = np.repeat(np.arange(len(tickers)), [len(d) for d, _ in series])
+    days = np.unique(all_days)
+    matrix = np.full((len(days), len(tickers)), np.nan)
+    matrix[np.searchsorted(days, all_days), columns] = all_closes
+    return days, tickers, matrix
+
+
+def _forward_fill(matrix):
+    rows = np.arange(matrix.shape[0])[:, None]
+    last_valid = np.where(np.isnan(matrix), 0, rows)
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    return matrix[last_valid, np.arange(matrix.shape[1])]
+
+
+def _daily_returns(filled, matrix):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = filled[1:] / filled[:-1] - 1
+    # No bar that day -> no return (the gap shows up in the next bar's return)
+    returns[np.isnan(matrix[1:])] = np.nan
+    return returns
+
+
+def compute_risk_features(days, tickers, matrix, windows=WINDOWS, risk_free_rate=0.0):
+    """
+    Batched risk features for every ticker and window in a few NumPy passes.
+
+    Per window: annualized volatility, Sharpe, Sortino, downside deviation,
+    max drawdown (negative fraction) and average annual return. Tickers
+    with fewer than MIN_OBSERVATIONS returns in a window get NaN there.
+    Returns a DataFrame indexed by ticker with `<feature>_<window>` columns
+    plus unsuffixed columns for DEFAULT_WINDOW.
+    """
+    filled = _forward_fill(matrix)
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        returns = _daily_returns(filled, matrix)
+        daily_rf = risk_free_rate / TRADING_DAYS
+
+        frame = {}
+        for name, length in windows.items():
+            r = returns[-length:]
+            prices = filled[-(length + 1):]
+            count = np.sum(~np.isnan(r), axis=0)
+            mean = np.nanmean(r, axis=0)
+            std = np.nanstd(r, axis=0, ddof=1)
+            downside = np.sqrt(np.nanmean(np.minimum(r - daily_rf, 0) ** 2, axis=0))
+
+            volatility = std * np.sqrt(TRADING_DAYS)
+            sharpe = (mean - daily_rf) / std * np.sqrt(TRADING_DAYS)
+            sortino = (mean - daily_rf) / downside * np.sqrt(TRADING_DAYS)
+            # Flat series (e.g. LIQUIDBEES some days): tiny volatility, Sharpe 0
+            flat = std == 0
+            volatility[flat] = 0.001
+            sharpe[flat] = 0
+            sortino[downside == 0] = 0
+
+            peaks = np.fmax.accumulate(prices, axis=0)
+            max_drawdown = np.nanmin(prices / peaks - 1, axis=0)
+
+            too_short = count < MIN_OBSERVATIONS
+            for feature, values in (
+                ("volatility", volatility),
+                ("sharpe_ratio", sharpe),
+                ("sortino_ratio", sortino),
+                ("downside_deviation", downside * np.sqrt(TRADING_DAYS)),
+                ("max_drawdown", max_drawdown),
+                ("avg_return", mean * TRADING_DAYS),
+            ):
+                values = np.where(too_short, np.nan, values)
+                frame[f"{feature}_{name}"] = values
+                if name == DEFAULT_WINDOW:
+                    frame[feature] = values
+
+    return pd.DataFrame(frame, index=pd.Index(tickers, name="ticker"))
+
+
+def returns_covariance(days, tickers, matrix, window=DEFAULT_WINDOW):
+    """
+    Annualized covariance of daily returns over `window` for the aligned
+    matrix, in `tickers` order. Missing returns count as zero deviation
+    from the ticker's mean, which keeps the matrix positive semi-definite
+    (pairwise-complete estimates don't). Tickers with fewer than
+    MIN_OBSERVATIONS returns get a NaN row/column.
+    """
+    if not len(tickers):
+        return np.zeros((0, 0))
+    returns = _daily_returns(_forward_fill(matrix), matrix)[-WINDOWS[window]:]
+    valid = ~np.isnan(returns)
+    count = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(valid, returns, 0).sum(axis=0) / count
+    deviations = np.where(valid, returns - mean, 0)
+    covariance = deviations.T @ deviations / max(len(returns) - 1, 1) * TRADING_DAYS
+    too_short = count < MIN_OBSERVATIONS
+    covariance[too_short, :] = np.nan
+    covariance[:, too_short] = np.nan
+    return covariance
@@ -0,0 +1,118 @@
+# risk_model.py
+import datetime
+import glob
+import json
+import os
+import re
+
+import numpy as np
+
+from scheme_snapshot import write_text_atomic
+
+MODEL_DIR = "risk_models"
+N_CLUSTERS = 3 # Low-M, Medium-M, High-M
+MARKET_LABELS = ("Low-M", "Medium-M", "High-M") # in order of cluster volatility
+MINIBATCH_THRESHOLD = 10000 # "auto" mode switches to MiniBatchKMeans above this many schemes
+
+
+class RiskClusterModel:
+    """
+    The fitted part of the K-Means labeling step: scaler mean/scale,
+    centroids and the volatility-ordered cluster -> market label mapping.
+
+    Persisted as `risk_models/risk_model_v<N>.json`. Old versions are
+    kept, so labels stay stable between runs and a refit can be rolled
+    back. `predict()` is a plain nearest-centroid lookup in NumPy - no
+    sklearn needed - so a run with a saved model labels the whole
+    universe in milliseconds.
+    """
+    def __init__(self, features, mean, scale, centroids, cluster_labels,
+                 version=1, algorithm="kmeans", n_samples=0, fitted_at=None):
+        self.features = list(features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.cluster_labels = list(cluster_labels) # cluster id -> "Low-M"/"Medium-M"/"High-M"
+        self.version = version
+        self.algorithm = algorithm
+        self.n_samples = n_samples
+        self.fitted_at = fitted_at or datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+    @classmethod
+    def fit(cls, df, features, mode="kmeans", version=1, random_state=42):
+        """
+        Fit scaler + clusters on `df[features]`. `mode` is "kmeans",
+        "minibatch" or "auto" (MiniBatchKMeans for large universes).
+        `df` must have a `volatility` column - clusters are named by it.
+        """
+        from sklearn.cluster import KMeans, MiniBatchKMeans
+        from sklearn.preprocessing import StandardScaler
+
+        if mode == "auto":
+            mode = "minibatch" if len(df) > MINIBATCH_THRESHOLD else "kmeans"
+        scaler = StandardScaler()
+        scaled_features = scaler.fit_transform(df[features])
+        if mode == "minibatch":
+            kmeans = MiniBatchKMeans(n_clusters=N_CLUSTERS, random_state=random_state, n_init=3, batch_size=4096)
+        else:
+            kmeans = KMeans(n_clusters=N_CLUSTERS, random_state=random_state, n_init=10)
+        clusters = kmeans.fit_predict(scaled_features)
+
+        # Map market clusters by mean volatility: lowest -> Low-M ... highest -> High-M
+        cluster_volatility = df['volatility'].groupby(clusters).mean().sort_values()
+        cluster_labels = [None] * N_CLUSTERS
+        for label, cluster in zip(MARKET_LABELS, cluster_volatility.index):
+            cluster_labels[int(cluster)] = label
+        return cls(features, scaler.mean_, scaler.scale_, kmeans.cluster_centers_, cluster_labels,
+                   version=version, algorithm=mode, n_samples=len(df))
+
+    def _nearest(self, values):
+        scaled = (np.asarray(values, dtype=np.float64) - self.mean) / self.scale
+        distances = ((scaled[:, None, :] - self.centroids[None, :, :]) ** 2).sum(axis=2)
+        return np.asarray(self.cluster_labels, dtype=object)[distances.argmin(axis=1)]
+
+    def predict(self, df):
+        """Market labels for every row of `df[self.features]` by nearest centroid."""
+        return self._nearest(df[self.features])
+
+    @property
+    def mapping(self):
+        return dict(enumerate(self.cluster_labels))
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "fitted_at": self.fitted_at,
+            "algorithm": self.algorithm,
+            "n_samples": self.n_samples,
+            "features": self.features,
+            "scaler_mean": self.mean.tolist(),
+            "scaler_scale": self.scale.tolist(),
+            "centroids": self.centroids.tolist(),
+            "cluster_labels": self.cluster_labels,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["features"], data["scaler_mean"], data["scaler_scale"], data["centroids"],
+                   data["cluster_labels"], version=data["version"], algorithm=data["algorithm"],
+                   n_samples=data["n_samples"], fitted_at=data["fitted_at"])
+
+    def save(self, model_dir=MODEL_DIR):
+        os.makedirs(model_dir, exist_ok=True)
+        path = os.path.join(model_dir, f"risk_model_v{self.version}.json")
+        write_text_atomic(json.dumps(self.to_dict(), indent=4), path)
+        return path
+
+    @classmethod
+    def load_latest(cls, model_dir=MODEL_DIR):
+        """Newest saved model, or None if nothing has been fitted yet."""
+        versions = []
+        for path in glob.glob(os.path.join(model_dir, "risk_model_v*.json")):
+            match = re.search(r"risk_model_v(\d+)\.json$", path)
+            if match:
+                versions.append((int(match.group(1)), path))
+        if not versions:
+            return None
+        with open(max(versions)[1], "r") as f:
+            return cls.from_dict(json.load(f))
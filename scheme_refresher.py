@@ -0,0 +1,157 @@
+# scheme_refresher.py
+import logging
+import os
+import threading
+import time
+
+from metrics import REGISTRY
+from scheme_snapshot import SCHEMES_FILE, SchemeSnapshot, write_schemes_file
+
+try:
+    import fcntl
+except ImportError: # Windows - no flock, a single dev process relabels on its own
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+SNAPSHOT_SWAPS = REGISTRY.counter("scheme_snapshot_swaps_total", "Scheme snapshots swapped in by the refresher")
+REFRESH_FAILURES = REGISTRY.counter("scheme_refresh_failures_total", "Refresher iterations that failed")
+JOB_SECONDS = REGISTRY.histogram(
+    "data_preparation_job_seconds", "Background run_ai_labeling_job duration", ("result",))
+
+
+class RelabelLock:
+    """
+    Exclusive, non-blocking flock on `<schemes>.relabel.lock`. Whoever holds
+    it is the only process that runs run_ai_labeling_job (fetching prices,
+    appending to price_history/, writing risk_models/ and the scheme file).
+    Held until the process exits; the OS drops it if the holder dies, and
+    the next process to try takes over.
+    """
+    def __init__(self, schemes_path=SCHEMES_FILE):
+        self.path = os.path.splitext(schemes_path)[0] + ".relabel.lock"
+        self._fd = None
+
+    def acquire(self):
+        if self._fd is not None or fcntl is None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            os.close(self._fd) # closing the fd drops the flock
+            self._fd = None
+
+
+class SchemeRefresher:
+    """
+    Background worker that keeps FundScreenerAgent's snapshot fresh
+    without restarting the server.
+
+    - Every `poll_seconds` it checks the scheme file's mtime and, if it
+      changed, loads a new SchemeSnapshot off the request path and swaps it in.
+    - If `relabel_seconds` is set, it also runs data_preparation's
+      `run_ai_labeling_job` on that schedule and writes the result to the
+      scheme file (which the next poll then picks up). Only the process
+      holding the RelabelLock does this - with several gunicorn workers one
+      of them relabels, the others just poll the file.
+
+    Hooks registered with `before_swap` get the new snapshot before it is
+    published (e.g. to build its caches), so a request never finds a live
+    snapshot with nothing warmed for it; if one raises, the old snapshot
+    stays live and the file is retried on the next poll. Listeners
+    registered with `on_swap` are called after every swap.
+    """
+    def __init__(self, screener_agent, path=SCHEMES_FILE, poll_seconds=30, relabel_seconds=0):
+        self.screener_agent = screener_agent
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.relabel_seconds = relabel_seconds
+        self.preparers = []
+        self.listeners = []
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_relabel = time.monotonic()
+        self._seen_mtime = screener_agent.snapshot.source_mtime
+        self.relabel_lock = RelabelLock(path)
+
+    def before_swap(self, preparer):
+        self.preparers.append(preparer)
+        return preparer
+
+    def on_swap(self, listener):
+        self.listeners.append(listener)
+        return listener
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="scheme-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.relabel_lock.release()
+
+    def _loop(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                if self.relabel_seconds and time.monotonic() - self._last_relabel >= self.relabel_seconds:
+                    self._last_relabel = time.monotonic()
+                    if self.relabel_lock.acquire(): # else another process relabels
+                        self.relabel()
+                self.check_for_update()
+            except Exception as e:
+                # Worker never dies on a bad file / failed job; old snapshot stays live
+                self.last_error = f"{e}"
+                REFRESH_FAILURES.inc()
+                logger.exception("Scheme refresh failed, keeping snapshot %s", self.screener_agent.snapshot.version)
+
+    def check_for_update(self):
+        """Reload if the file on disk differs from the live snapshot. Returns True on swap."""
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._seen_mtime:
+            return False
+        snapshot = SchemeSnapshot.from_file(self.path)
+        if snapshot.version == self.screener_agent.snapshot.version:
+            # Touched but same content - nothing to swap
+            self._seen_mtime = snapshot.source_mtime
+            return False
+        self.swap(snapshot)
+        # Only after a successful swap - a failed warm-up is retried next poll
+        self._seen_mtime = snapshot.source_mtime
+        return True
+
+    def swap(self, snapshot):
+        old_version = self.screener_agent.snapshot.version
+        for preparer in self.preparers:
+            preparer(snapshot) # still the old snapshot for every request meanwhile
+        self.screener_agent.swap_snapshot(snapshot)
+        self.last_error = None
+        SNAPSHOT_SWAPS.inc()
+        logger.info("Swapped scheme snapshot %s -> %s (%d schemes)", old_version, snapshot.version, len(snapshot))
+        for listener in self.listeners:
+            listener(snapshot)
+
+    def relabel(self):
+        # yfinance/sklearn are only needed when relabeling is switched on
+        from data_preparation import run_ai_labeling_job
+        began = time.perf_counter()
+        try:
+            final_schemes_json = run_ai_labeling_job(schemes_path=self.path)
+        except Exception:
+            JOB_SECONDS.observe(time.perf_counter() - began, "error")
+            raise
+        JOB_SECONDS.observe(time.perf_counter() - began, "ok" if final_schemes_json else "empty")
+        if final_schemes_json:
+            write_schemes_file(final_schemes_json, self.path)
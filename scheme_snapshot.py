@@ -0,0 +1,297 @@
+# scheme_snapshot.py
+import hashlib
+import json
+import logging
+import os
+import stat
+import tempfile
+import time
+from collections.abc import Mapping
+
+import numpy as np
+
+SCHEMES_FILE = "schemes_master_list_v2.json"
+SHORTLIST_SIZE = 20 # Top 20 ah anuppalam
+
+# profile -> (allowed risk labels, sort column, descending?)
+PROFILE_RULES = {
+    "Aggressive": (("High", "Medium"), "sharpe_ratio", True),
+    "Moderate": (("Medium", "Low"), "sharpe_ratio", True),
+    # Conservative ku safety mukkiyam, Sharpe Ratio illa
+    "Conservative": (("Low", "Very Low"), "volatility", False),
+    "Very Conservative": (("Very Low",), "volatility", False),
+}
+
+# Internal fields never sent to the frontend
+PRIVATE_FUND_FIELDS = ('ticker', 'volatility', 'sharpe_ratio')
+_MISSING = object() # column value for a scheme that doesn't have that field
+
+logger = logging.getLogger(__name__)
+
+
+class SchemeTable:
+    """
+    The scheme list stored column-wise: one tuple per field, one slot per
+    scheme. Schemes don't all share the same fields (FD/SGB carry
+    avg_return), so each row also points at its field layout - a handful
+    of shared key tuples for the whole universe, not a dict per scheme.
+
+    The public layout (fields minus PRIVATE_FUND_FIELDS) is worked out once
+    per distinct layout, so a response view is just the columns read in
+    that order plus percent and explanation.
+    """
+    def __init__(self, schemes):
+        layouts = {} # key tuple -> itself, so equal layouts are one object
+        self.layouts = tuple([layouts.setdefault(keys, keys) for keys in map(tuple, schemes)])
+        self.fields = tuple(dict.fromkeys(k for keys in layouts for k in keys))
+        self.public_layouts = {keys: tuple(k for k in keys if k not in PRIVATE_FUND_FIELDS) for keys in layouts}
+        self.columns = {}
+        for field in self.fields:
+            values = [scheme.get(field, _MISSING) for scheme in schemes]
+            if isinstance(values[0], str):
+                # Categorical text (category, risk_label): each distinct string stored once
+                pool = {}
+                values = [pool.setdefault(v, v) for v in values]
+            self.columns[field] = tuple(values)
+        self.records = tuple(map(SchemeRecord, [self] * len(self.layouts), range(len(self.layouts))))
+
+    def column(self, field, default=None):
+        """All values of `field`, `default` where a scheme doesn't have it."""
+        values = self.columns.get(field)
+        if values is None:
+            return [default] * len(self.records)
+        return [default if v is _MISSING else v for v in values]
+
+    def __len__(self):
+        return len(self.records)
+
+
+class SchemeRecord(Mapping):
+    """
+    One scheme, read-only: a (table, row) pair that reads like the dict it
+    was loaded from (fund['category'], fund.get('avg_return'), ...) but has
+    no per-scheme dict and can't be written to. Shared by every request
+    holding the snapshot, so nothing may change it - responses get a fresh
+    public_view() instead.
+    """
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table, row):
+        object.__setattr__(self, '_table', table)
+        object.__setattr__(self, '_row', row)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SchemeRecord is read-only")
+
+    def __getitem__(self, field):
+        column = self._table.columns.get(field)
+        value = _MISSING if column is None else column[self._row]
+        if value is _MISSING:
+            raise KeyError(field)
+        return value
+
+    def __iter__(self):
+        return iter(self._table.layouts[self._row])
+
+    def __len__(self):
+        return len(self._table.layouts[self._row])
+
+    def __eq__(self, other):
+        return self is other or Mapping.__eq__(self, other)
+
+    __hash__ = None # equal to a dict with the same fields, so unhashable like one
+
+    def __repr__(self):
+        return f"SchemeRecord({dict(self)!r})"
+
+    def public_view(self, percent, explanation):
+        """New response dict: the public fields, then this request's explanation and percent."""
+        columns, row = self._table.columns, self._row
+        view = {field: columns[field][row] for field in self._table.public_layouts[self._table.layouts[row]]}
+        view['explanation'] = explanation
+        view['percent'] = percent
+        return view
+
+
+class SchemeIndex:
+    """
+    Columnar view of the scheme list plus the ready-sorted top-K shortlist
+    for every risk profile. Built once when schemes are loaded, so a
+    screener call is a dict lookup instead of a filter + sort over the
+    whole universe.
+    """
+    def __init__(self, table, k=SHORTLIST_SIZE):
+        self.k = k
+        schemes = table.records
+        self.risk_label = np.array(table.column('risk_label', ''), dtype=str)
+        self.sharpe = np.array(table.column('sharpe_ratio', 0), dtype=np.float64)
+        self.volatility = np.array(table.column('volatility', 1), dtype=np.float64)
+        self.shortlists = {}
+        for profile, (labels, column, descending) in PROFILE_RULES.items():
+            positions = self._top_k(labels, column, descending)
+            self.shortlists[profile] = tuple(schemes[i] for i in positions)
+
+    def _top_k(self, labels, column, descending):
+        candidates = np.flatnonzero(np.isin(self.risk_label, labels))
+        keys = self.sharpe if column == "sharpe_ratio" else self.volatility
+        keys = keys[candidates]
+        if descending:
+            keys = -keys
+        if len(candidates) > self.k:
+            # O(n) partition first; keep every tie at the cut-off so the
+            # result matches a full stable sort
+            kth = np.partition(keys, self.k - 1)[self.k - 1]
+            keep = keys <= kth
+            candidates, keys = candidates[keep], keys[keep]
+        # Stable order: key first, original file position breaks ties
+        order = np.lexsort((candidates, keys))[:self.k]
+        return candidates[order]
+
+
+class SchemeSnapshot:
+    """
+    One immutable generation of scheme data: the scheme list (as read-only
+    SchemeRecords over a SchemeTable), its SchemeIndex and a content
+    version. Never modified after construction; a refresh builds a new
+    snapshot and swaps the reference, so a request that grabbed the old
+    one keeps a consistent view until it finishes.
+    """
+    def __init__(self, schemes, version="empty", source_mtime=None, allocation_model=None):
+        self.table = SchemeTable(schemes)
+        self.schemes = self.table.records
+        self.index = SchemeIndex(self.table)
+        tickers = self.table.column('ticker', _MISSING)
+        self.by_ticker = {t: s for t, s in zip(tickers, self.schemes) if t is not _MISSING}
+        tickers_by_name = {}
+        for t, s in zip(tickers, self.schemes):
+            if t is not _MISSING:
+                tickers_by_name.setdefault(s['scheme_name'], {})[t] = None
+        self.ticker_by_name = {name: next(iter(ts)) for name, ts in tickers_by_name.items() if len(ts) == 1}
+        # Names used by more than one ticker - a fund given by name alone can't be told apart
+        self.ambiguous_names = frozenset(name for name, ts in tickers_by_name.items() if len(ts) > 1)
+        # Optimizer output (expected returns, covariance, per-profile weights) or None
+        self.allocation_model = allocation_model
+        self.allocations = self._plan_allocations(allocation_model)
+        self.version = version
+        self.source_mtime = source_mtime
+        self.loaded_at = time.time()
+
+    def _plan_allocations(self, model):
+        """
+        profile -> (allocation by risk bucket, ((fund, percent), ...)), with
+        whole-number percents that add up to 100. Built once per snapshot so
+        a request's allocation step is a dict lookup.
+        """
+        plans = {}
+        for profile, result in (model or {}).get("profiles", {}).items():
+            held = [(self.by_ticker[t], w) for t, w in result["weights"].items() if t in self.by_ticker]
+            if not held:
+                continue
+            held.sort(key=lambda item: -item[1])
+            percents = whole_percents([w for _, w in held])
+            funds = tuple((fund, p) for (fund, _), p in zip(held, percents) if p > 0)
+            allocation = {}
+            for fund, percent in funds:
+                bucket = f"{fund.get('risk_label', 'Unlabeled')} Risk"
+                allocation[bucket] = allocation.get(bucket, 0) + percent
+            plans[profile] = (allocation, funds)
+        return plans
+
+    @classmethod
+    def from_file(cls, path=SCHEMES_FILE):
+        stat = os.stat(path)
+        with open(path, "rb") as f:
+            raw = f.read()
+        schemes = json.loads(raw)
+        version = content_version(raw)
+        model, model_raw = load_allocation_model(allocation_model_path(path), version)
+        if model is not None:
+            version = content_version(raw + model_raw) # new weights alone also make a new generation
+        return cls(schemes, version=version, source_mtime=stat.st_mtime_ns, allocation_model=model)
+
+    def __len__(self):
+        return len(self.schemes)
+
+
+def content_version(raw):
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+def whole_percents(weights):
+    # Largest remainder: integers proportional to `weights` that sum to exactly 100
+    total = sum(weights)
+    exact = [w / total * 100 for w in weights]
+    percents = [int(x) for x in exact]
+    by_remainder = sorted(range(len(exact)), key=lambda i: percents[i] - exact[i])
+    for i in by_remainder[:100 - sum(percents)]:
+        percents[i] += 1
+    return percents
+
+
+def allocation_model_path(schemes_path=SCHEMES_FILE):
+    # schemes_master_list_v2.json -> schemes_master_list_v2.allocations.json
+    return os.path.splitext(schemes_path)[0] + ".allocations.json"
+
+
+def load_allocation_model(path, schemes_version):
+    """
+    (model, raw bytes) for the optimizer output written alongside the scheme
+    file, or (None, b"") if there is none or it was computed for different
+    scheme content.
+    """
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        model = json.loads(raw)
+    except (OSError, ValueError):
+        return None, b""
+    if model.get("schemes_version") != schemes_version:
+        logger.warning("Ignoring %s: built for schemes %s, file is %s", path, model.get('schemes_version'), schemes_version)
+        return None, b""
+    return model, raw
+
+
+def write_text_atomic(text, path):
+    """
+    Write via temp file + rename, so a reader never sees a half-written file.
+    """
+    _write_atomic(text, path, "w")
+
+
+def write_bytes_atomic(data, path):
+    # Same, for binary files (PriceStore.replace)
+    _write_atomic(data, path, "wb")
+
+
+# Read once at import: os.umask() can only be read by setting it, which isn't thread-safe later
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _write_atomic(data, path, mode):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.splitext(path)[1])
+    try:
+        # mkstemp makes the file 0600 - keep the replaced file's mode, or a normal new-file mode
+        try:
+            file_mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            file_mode = 0o666 & ~_UMASK
+        os.chmod(tmp_path, file_mode)
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_schemes_file(schemes_json, path=SCHEMES_FILE):
+    # Atomic, so SchemeRefresher never loads a partial JSON
+    write_text_atomic(schemes_json, path)
+
+
+def write_allocation_model(model, schemes_path=SCHEMES_FILE):
+    # Written before the scheme file, so the refresher's next reload sees both
+    write_text_atomic(json.dumps(model), allocation_model_path(schemes_path))
@@ -0,0 +1,53 @@
+# tests/conftest.py
+import itertools
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT) # flat modules at the repo root
+
+# app.py reads DATABASE_URL at import time - never touch site.db from tests
+os.environ["DATABASE_URL"] = "sqlite://"
+
+
+@pytest.fixture(scope="session")
+def backend():
+    # Imported here so tests that don't need Flask never load it
+    import app as backend
+    from scheme_snapshot import SCHEMES_FILE
+    backend.create_app(os.path.join(ROOT, SCHEMES_FILE), start_refresher=False)
+    return backend
+
+
+@pytest.fixture(scope="session")
+def client(backend):
+    return backend.app.test_client()
+
+
+
+_emails = itertools.count()
+
+
+def user_headers(backend):
+    # New user straight in the DB + its token - bcrypt isn't what these tests are about
+    from flask_jwt_extended import create_access_token
+    with backend.app.app_context():
+        user = backend.User(email=f"user{next(_emails)}@example.com", password_hash="x")
+        backend.db.session.add(user)
+        backend.db.session.commit()
+        return {"Authorization": f"Bearer {create_access_token(identity=str(user.id))}"}
+
+
+@pytest.fixture
+def auth(backend):
+    return user_headers(backend)
+
+
+@pytest.fixture
+def generated(client):
+    # A portfolio as /generate_portfolio returns it - what clients save
+    response = client.post("/generate_portfolio", json={"Quiz_Answer_1": "A", "Quiz_Answer_2": "B", "horizon": 5})
+    assert response.status_code == 200
+    return response.json
@@ -0,0 +1,107 @@
+# tests/test_admission.py
+import threading
+import time
+
+import pytest
+
+from admission import ADMITTED, BYPASSED, SHED, AdmissionLimiter, Overloaded
+from scheme_snapshot import SchemeSnapshot
+
+
+def hold_slot(limiter, release):
+    # Take the only slot in another thread and keep it until `release` is set
+    started = threading.Event()
+
+    def run():
+        with limiter.admit():
+            started.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    started.wait(5)
+    return thread
+
+
+def test_queue_full_is_429():
+    limiter = AdmissionLimiter("test-full", 1, 0, 1.0)
+    release = threading.Event()
+    thread = hold_slot(limiter, release)
+    with pytest.raises(Overloaded) as error:
+        limiter.acquire()
+    assert error.value.status == 429 and error.value.retry_after == 1
+    assert SHED.value("test-full", "queue_full") == 1
+    release.set()
+    thread.join()
+    assert limiter.active == 0
+
+
+def test_deadline_is_503():
+    limiter = AdmissionLimiter("test-deadline", 1, 1, 0.05)
+    release = threading.Event()
+    thread = hold_slot(limiter, release)
+    began = time.monotonic()
+    with pytest.raises(Overloaded) as error:
+        limiter.acquire()
+    assert error.value.status == 503 and error.value.retry_after == 1
+    assert time.monotonic() - began < 1
+    assert limiter.waiting == 0
+    release.set()
+    thread.join()
+
+
+def test_queued_request_gets_the_slot():
+    limiter = AdmissionLimiter("test-handoff", 1, 1, 5.0)
+    release = threading.Event()
+    thread = hold_slot(limiter, release)
+    threading.Timer(0.05, release.set).start()
+    with limiter.admit():
+        assert limiter.active == 1
+    thread.join()
+    assert (limiter.active, limiter.waiting) == (0, 0)
+    assert ADMITTED.value("test-handoff") == 2
+
+
+def test_bypass_is_counted_only():
+    limiter = AdmissionLimiter("test-bypass", 1, 0, 1.0)
+    limiter.bypass()
+    assert BYPASSED.value("test-bypass") == 1 and limiter.active == 0
+
+
+@pytest.fixture
+def saturated(backend, monkeypatch):
+    # No slot and no queue: anything that needs a slot is shed straight away
+    def saturate(endpoint, max_queue=0, queue_timeout=1.0):
+        monkeypatch.setitem(backend.limiters, endpoint, AdmissionLimiter(endpoint, 0, max_queue, queue_timeout))
+    return saturate
+
+
+def test_cache_hits_skip_admission(backend, client, saturated):
+    saturated("generate_portfolio")
+    assert client.post("/generate_portfolio", json={"Quiz_Answer_1": "B"}).status_code == 200
+
+
+def test_cache_miss_is_shed(backend, client, saturated, monkeypatch):
+    saturated("generate_portfolio")
+    live = backend.screener_agent.snapshot
+    unwarmed = SchemeSnapshot([dict(s) for s in live.schemes], version="unwarmed")
+    monkeypatch.setattr(backend.screener_agent, "snapshot", unwarmed)
+    response = client.post("/generate_portfolio", json={"Quiz_Answer_1": "B"})
+    assert response.status_code == 429 and response.headers["Retry-After"] == "1"
+
+
+def test_batch_and_projection_are_shed(client, generated, saturated):
+    options = dict(generated, paths=100, seed=11)
+    assert client.post("/project_portfolio", json=options).status_code == 200 # cached from here on
+    saturated("generate_portfolios")
+    saturated("projection", max_queue=1, queue_timeout=0.05)
+    assert client.post("/generate_portfolios", json=[{}]).status_code == 429
+    assert client.post("/project_portfolio", json=options).status_code == 200
+    response = client.post("/project_portfolio", json=dict(options, seed=12))
+    assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+
+
+def test_limits_leave_threads_free(backend):
+    # Running + queued per endpoint stays within half the worker's threads
+    for running, queued, _ in backend.app.config['ADMISSION_LIMITS'].values():
+        assert running >= 1 and running + queued <= max(1, backend.WORKER_THREADS // 2)
@@ -0,0 +1,44 @@
+# tests/test_app_factory.py
+from portfolio_cache import CACHE_MISSES
+
+
+def test_ready_reports_the_live_snapshot(backend, client):
+    response = client.get("/ready")
+    assert response.status_code == 200
+    snapshot = backend.screener_agent.snapshot
+    assert response.json["snapshot"] == snapshot.version
+    assert response.json["schemes"] == len(snapshot) > 0
+
+
+def test_not_ready_is_503(backend, client, monkeypatch):
+    monkeypatch.setattr(backend, "response_cache", None)
+    response = client.get("/ready")
+    assert response.status_code == 503 and response.json["status"] == "loading"
+
+
+def test_create_app_runs_once(backend):
+    loaded = (backend.screener_agent, backend.response_cache, backend.explainer_agent, backend.scheme_refresher)
+    assert backend.create_app(start_refresher=False) is backend.app
+    assert (backend.screener_agent, backend.response_cache, backend.explainer_agent,
+            backend.scheme_refresher) == loaded
+
+
+def test_first_request_is_a_cache_hit(client):
+    # Responses were built at startup - nothing is built on the request path
+    misses = CACHE_MISSES.value()
+    for payload in ({"Quiz_Answer_1": "B", "horizon": "7+ Years"}, {"Quiz_Answer_2": "A"}, {}):
+        assert client.post("/generate_portfolio", json=payload).status_code == 200
+    assert CACHE_MISSES.value() == misses
+
+
+def test_after_fork_starts_the_refresher(backend):
+    refresher = backend.scheme_refresher
+    assert refresher._thread is None or not refresher._thread.is_alive()
+    backend.after_fork()
+    try:
+        assert refresher._thread.is_alive()
+        backend.create_app() # already running - not started twice
+        assert refresher._thread.is_alive()
+    finally:
+        refresher.stop(timeout=1)
+    assert not refresher._thread.is_alive()
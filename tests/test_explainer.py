@@ -0,0 +1,80 @@
+# tests/test_explainer.py
+import itertools
+
+from benchmarks.synthetic import make_universe
+from explainable_ai_agent import ExplainableAIAgent
+from scheme_snapshot import PROFILE_RULES, SchemeSnapshot
+
+PROFILES = list(PROFILE_RULES) + [None]
+
+
+def reference_explain(fund_data, user_profile):
+    # The rule chain before compiling/memoizing, run in full for every fund
+    reasons = []
+    sharpe = fund_data.get('sharpe_ratio', 0)
+    risk = fund_data.get('risk_label', 'Medium')
+    category = fund_data.get('category', '')
+    if risk == "Very Low":
+        if 'Fixed Deposit' in category:
+            reasons.append("Guaranteed Returns & Capital Safety (FD)")
+        elif 'Gold Bond' in category:
+            reasons.append("Government Backed + Gold Exposure (SGB)")
+        elif 'Liquid' in category:
+            reasons.append("Very Safe for Short Term Parking")
+        return reasons[:2]
+    if sharpe > 1.2: reasons.append(f"Excellent Risk-Adjusted Return (Sharpe: {sharpe:.2f})")
+    elif sharpe > 0.8: reasons.append(f"Good Risk-Adjusted Return (Sharpe: {sharpe:.2f})")
+    if risk == 'Low' and user_profile in ["Conservative", "Moderate"]: reasons.append("Provides Stability & Lower Risk")
+    if risk == 'Medium' and user_profile == 'Moderate': reasons.append("Matches your Balanced Profile")
+    if risk == 'High' and user_profile == 'Aggressive': reasons.append("Matches your Aggressive Growth goal")
+    if 'Index Fund' in category: reasons.append("Low-cost & Diversified Market Exposure")
+    if 'Gold' in category: reasons.append("Hedge against Inflation (Gold)")
+    if 'Small-Cap' in category: reasons.append("High Growth Potential (Small Cap)")
+    if 'Large-Cap' in category: reasons.append("Invests in Stable Large Companies")
+    if not reasons: reasons.append("A solid choice for diversification")
+    return reasons[:2]
+
+
+def funds():
+    schemes = make_universe(400, seed=4)
+    # Bucket edges, missing fields and the odd category
+    schemes += [{"scheme_name": f"Edge {s}", "ticker": f"EDGE{i}", "category": "Gold ETF", "risk_label": "Low",
+                 "sharpe_ratio": s} for i, s in enumerate((0.8, 0.80001, 1.2, 1.20001, -1.0))]
+    schemes += [{"scheme_name": "Bare"}, {"scheme_name": "Liquid", "category": "Liquid Debt", "risk_label": "Very Low"},
+                {"scheme_name": "Hybrid", "category": "Hybrid Fund", "risk_label": "Medium", "sharpe_ratio": 0.1}]
+    return schemes
+
+
+def test_matches_reference_with_and_without_snapshot():
+    schemes = funds()
+    snapshot = SchemeSnapshot(schemes, version="v1")
+    agent = ExplainableAIAgent()
+    for fund, profile in itertools.product(snapshot.schemes, PROFILES):
+        expected = reference_explain(fund, profile)
+        assert agent.run(fund, profile) == expected
+        assert agent.run(fund, profile, snapshot) == expected
+        assert agent.run(fund, profile, snapshot) == expected # memoized
+    for profile in PROFILES:
+        assert agent.explain_many(snapshot.schemes, profile, snapshot) == \
+               [reference_explain(f, profile) for f in schemes]
+        assert agent.explain_many(schemes, profile) == [reference_explain(f, profile) for f in schemes]
+
+
+def test_results_are_copies():
+    snapshot = SchemeSnapshot(funds(), version="v1")
+    agent = ExplainableAIAgent()
+    fund = snapshot.schemes[0]
+    agent.run(fund, "Moderate", snapshot).append("changed by a caller")
+    assert agent.run(fund, "Moderate", snapshot) == reference_explain(fund, "Moderate")
+
+
+def test_memo_keeps_recent_snapshots():
+    agent = ExplainableAIAgent()
+    snapshots = [SchemeSnapshot(make_universe(20), version=f"v{i}") for i in range(3)]
+    for snapshot in snapshots:
+        agent.warm(snapshot)
+    assert list(agent._explanations) == ["v1", "v2"]
+    # Warmed: every shortlisted fund is already in the memo
+    shortlisted = {(f['scheme_name'], f['ticker'], profile)
+                   for profile, shortlist in snapshots[2].index.shortlists.items() for f in shortlist}
+    assert shortlisted <= set(agent._explanations["v2"])
@@ -0,0 +1,55 @@
+# tests/test_generate_batch.py
+import json
+
+import pytest
+
+PAYLOADS = [
+    {"Quiz_Answer_1": "C", "horizon": "7+ Years"},
+    {"Quiz_Answer_1": "A", "Quiz_Answer_2": "B", "horizon": 5},
+    {"Quiz_Answer_2": "A"},
+    {"Quiz_Answer_1": "C", "horizon": "7+ Years", "name": "extra fields are ignored"},
+]
+
+
+def records(response):
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    body = response.get_data()
+    response.close() # what the WSGI server does once the stream is sent - frees the admission slot
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def expected(client, payload):
+    return client.post("/generate_portfolio", json=payload).json
+
+
+def test_ndjson_in_order(backend, client, monkeypatch):
+    monkeypatch.setitem(backend.app.config, 'GENERATE_BATCH_CHUNK', 2) # several writes
+    lines = [json.dumps(p) for p in PAYLOADS[:2]] + ["", "{not json", "[1, 2]"] + [json.dumps(p) for p in PAYLOADS[2:]]
+    response = client.post("/generate_portfolios", data="\n".join(lines) + "\n",
+                           content_type="application/x-ndjson")
+    got = records(response)
+    assert [r["index"] for r in got] == list(range(6)) # the blank line isn't a payload
+    assert [r["status"] for r in got] == [200, 200, 400, 400, 200, 200]
+    assert [r["portfolio"] for r in got if r["status"] == 200] == [expected(client, p) for p in PAYLOADS]
+    assert "error" in got[2]["portfolio"]
+    assert backend.limiters['generate_portfolios'].active == 0 # slot handed back when the stream ends
+
+
+def test_json_array(client):
+    got = records(client.post("/generate_portfolios", json=PAYLOADS + [None]))
+    assert [r["portfolio"] for r in got[:-1]] == [expected(client, p) for p in PAYLOADS]
+    assert got[-1]["status"] == 400
+
+
+@pytest.mark.parametrize("body", [{"Quiz_Answer_1": "A"}, "x", None])
+def test_not_an_array_is_400(client, body):
+    assert client.post("/generate_portfolios", json=body).status_code == 400
+
+
+def test_json_array_limit(backend, client, monkeypatch):
+    monkeypatch.setitem(backend.app.config, 'GENERATE_BATCH_MAX', 3)
+    assert client.post("/generate_portfolios", json=PAYLOADS).status_code == 413
+    # NDJSON has no limit
+    body = "".join(json.dumps(p) + "\n" for p in PAYLOADS)
+    assert len(records(client.post("/generate_portfolios", data=body, content_type="application/x-ndjson"))) == 4
@@ -0,0 +1,46 @@
+# tests/test_metrics.py
+from metrics import PROMETHEUS_CONTENT_TYPE, MetricsRegistry
+
+
+def test_text_format():
+    registry = MetricsRegistry()
+    counter = registry.counter("jobs_total", "Jobs run", ("result",))
+    histogram = registry.histogram("job_seconds", "Job time", buckets=(0.1, 1.0))
+    registry.gauge("queue_depth", "Not known yet", lambda: None)
+    counter.inc("ok")
+    counter.inc("ok", amount=2)
+    counter.inc('say "hi"\n')
+    for seconds in (0.05, 0.5, 5):
+        histogram.observe(seconds)
+    assert registry.counter("jobs_total", "Jobs run", ("result",)) is counter # re-registering keeps one series
+    assert registry.render().splitlines() == [
+        "# HELP jobs_total Jobs run",
+        "# TYPE jobs_total counter",
+        'jobs_total{result="ok"} 3',
+        'jobs_total{result="say \\"hi\\"\\n"} 1',
+        "# HELP job_seconds Job time",
+        "# TYPE job_seconds histogram",
+        'job_seconds_bucket{le="0.1"} 1',
+        'job_seconds_bucket{le="1.0"} 2',
+        'job_seconds_bucket{le="+Inf"} 3',
+        "job_seconds_sum 5.55",
+        "job_seconds_count 3",
+        "# HELP queue_depth Not known yet",
+        "# TYPE queue_depth gauge",
+    ]
+
+
+def test_metrics_endpoint(client):
+    client.post("/generate_portfolio", json={"Quiz_Answer_1": "C", "horizon": "7+ Years"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == PROMETHEUS_CONTENT_TYPE
+    lines = response.get_data(as_text=True).splitlines()
+    assert any(line.startswith('http_requests_total{endpoint="generate_portfolio_route",status="200"} ')
+               for line in lines)
+    for prefix in ('http_request_seconds_count{endpoint="generate_portfolio_route",method="POST"} ',
+                   'portfolio_stage_seconds_count{stage="profile"} ',
+                   'portfolio_stage_seconds_count{stage="cache_lookup"} ',
+                   'admission_bypassed_total{endpoint="generate_portfolio"} ',
+                   "scheme_snapshot_schemes ", "scheme_snapshot_age_seconds "):
+        assert any(line.startswith(prefix) for line in lines), prefix
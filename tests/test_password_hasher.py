@@ -0,0 +1,63 @@
+# tests/test_password_hasher.py
+import os
+
+import pytest
+
+from password_hasher import HasherBusy, PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(rounds=4, workers=1, timeout=10)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_check_and_rehash(hasher):
+    stored = hasher.hash("s3cret")
+    assert stored.startswith("$2b$04$")
+    assert hasher.check(stored, "s3cret") and not hasher.check(stored, "wrong")
+    assert not hasher.check(stored, None) and not hasher.check("", "s3cret")
+    assert not hasher.needs_rehash(stored)
+    assert PasswordHasher(rounds=5).needs_rehash(stored)
+
+
+def test_full_queue_is_busy():
+    with pytest.raises(HasherBusy):
+        PasswordHasher(rounds=4, max_pending=0).hash("s3cret")
+
+
+def test_dead_worker_rebuilds_pool(hasher):
+    with pytest.raises(HasherBusy):
+        hasher._run(os._exit, 1) # worker process dies mid-call
+    assert hasher.check(hasher.hash("s3cret"), "s3cret")
+
+
+@pytest.fixture
+def use_rounds(backend):
+    def use_rounds(rounds):
+        # Next get_password_hasher() builds a new pool with this cost factor
+        if backend.password_hasher is not None:
+            backend.password_hasher.shutdown()
+        backend.password_hasher = None
+        backend.app.config['BCRYPT_LOG_ROUNDS'] = rounds
+    original = backend.app.config['BCRYPT_LOG_ROUNDS']
+    yield use_rounds
+    use_rounds(original)
+
+
+def test_login_upgrades_old_hashes(backend, client, use_rounds):
+    credentials = {"email": "rehash@example.com", "password": "s3cret"}
+
+    def stored_hash():
+        with backend.app.app_context():
+            return backend.User.query.filter_by(email=credentials["email"]).one().password_hash
+
+    use_rounds(4)
+    assert client.post("/signup", json=credentials).status_code == 201
+    assert stored_hash().startswith("$2b$04$")
+    use_rounds(5)
+    assert client.post("/login", json=credentials).status_code == 200
+    assert stored_hash().startswith("$2b$05$")
+    assert client.post("/login", json=credentials).status_code == 200
+    assert client.post("/login", json=dict(credentials, password="wrong")).status_code == 401
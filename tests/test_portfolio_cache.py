@@ -0,0 +1,77 @@
+# tests/test_portfolio_cache.py
+import json
+
+import pytest
+
+from benchmarks.synthetic import make_universe
+from portfolio_cache import CACHE_MISSES, PortfolioResponseCache
+from scheme_snapshot import SchemeSnapshot
+from user_profile_agent import UserProfileAgent
+
+AGENT = UserProfileAgent()
+
+
+@pytest.fixture
+def cache():
+    builds = []
+
+    def build_response(risk_profile, snapshot):
+        builds.append((risk_profile, snapshot.version))
+        return {"profile": risk_profile, "snapshot": snapshot.version}, 200
+
+    cache = PortfolioResponseCache(AGENT, build_response, lambda obj: json.dumps(obj, indent=2).encode())
+    cache.builds = builds
+    return cache
+
+
+def snapshot(version):
+    return SchemeSnapshot(make_universe(20), version=version)
+
+
+def test_every_quiz_key_maps_to_its_profile(cache):
+    v1 = snapshot("v1")
+    profiles = set()
+    for key in AGENT.QUIZ_SPACE:
+        q1, q2, horizon = key
+        profile = AGENT.run({"Quiz_Answer_1": q1, "Quiz_Answer_2": q2, "horizon": horizon})
+        body, status = cache.get(key, v1)
+        assert status == 200 and json.loads(body)["profile"] == profile
+        profiles.add(profile)
+    # One build per distinct profile, not per quiz key
+    assert sorted(cache.builds) == sorted((p, "v1") for p in profiles)
+
+
+def test_new_version_is_never_served_stale(cache):
+    key = AGENT.QUIZ_SPACE[0]
+    v1, v2 = snapshot("v1"), snapshot("v2")
+    cache.warm(v1)
+    assert cache.peek(key, v2) is None
+    misses = CACHE_MISSES.value()
+    assert json.loads(cache.get(key, v2)[0])["snapshot"] == "v2"
+    assert CACHE_MISSES.value() == misses + 1
+    # Still built: no more misses, and requests pinned to v1 keep their table
+    assert json.loads(cache.get(key, v2)[0])["snapshot"] == "v2"
+    assert CACHE_MISSES.value() == misses + 1
+    assert json.loads(cache.peek(key, v1)[0])["snapshot"] == "v1"
+
+
+def test_only_recent_generations_are_kept(cache):
+    key = AGENT.QUIZ_SPACE[0]
+    v1, v2, v3 = snapshot("v1"), snapshot("v2"), snapshot("v3")
+    for s in (v1, v2, v3):
+        cache.warm(s)
+    assert cache.peek(key, v1) is None
+    assert cache.peek(key, v2) is not None and cache.peek(key, v3) is not None
+    # Same version twice is built once
+    builds = len(cache.builds)
+    cache.warm(v3)
+    assert len(cache.builds) == builds
+
+
+def test_lines_match_bodies(cache):
+    v1 = snapshot("v1")
+    for key in AGENT.QUIZ_SPACE:
+        body, status = cache.get(key, v1)
+        line, line_status = cache.get_line(key, v1)
+        assert b"\n" not in line and line_status == status
+        assert json.loads(line) == json.loads(body)
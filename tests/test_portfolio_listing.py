@@ -0,0 +1,64 @@
+# tests/test_portfolio_listing.py
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from scheme_snapshot import SchemeSnapshot
+
+
+def test_batch_save_and_listing(client, auth, generated):
+    saved = client.post("/save_portfolios", json={"portfolios": [generated, generated]}, headers=auth)
+    assert saved.status_code == 201 and saved.json["count"] == 2
+    listed = client.get("/portfolios", headers=auth).json
+    assert sorted(p["id"] for p in listed["portfolios"]) == sorted(saved.json["ids"])
+
+
+def test_batch_is_one_transaction(client, auth, generated):
+    bad = dict(generated, schemes=[{"scheme_name": "No Such Fund", "percent": 100}])
+    assert client.post("/save_portfolios", json={"portfolios": [generated, bad]}, headers=auth).status_code == 400
+    assert client.get("/portfolios", headers=auth).json["portfolios"] == []
+
+
+def test_keyset_pages(client, auth, generated):
+    ids = client.post("/save_portfolios", json={"portfolios": [generated] * 5}, headers=auth).json["ids"]
+    seen, cursor = [], None
+    while True:
+        query = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        page = client.get("/portfolios", query_string=query, headers=auth).json
+        seen += [p["id"] for p in page["portfolios"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(ids, reverse=True) # newest first, nothing twice
+
+
+def test_scheme_rows_follow_the_snapshot(backend, auth, generated):
+    snapshot = backend.screener_agent.snapshot
+    fund = snapshot.by_ticker[next(iter(snapshot.by_ticker))]
+    renamed = SchemeSnapshot([dict(s, scheme_name="Renamed") if s is fund else dict(s) for s in snapshot.schemes],
+                             version="renamed")
+    with backend.app.app_context():
+        backend.upsert_schemes([fund['ticker']], snapshot)
+        backend.upsert_schemes([fund['ticker']], renamed)
+        row = backend.db.session.get(backend.Scheme, fund['ticker'])
+        assert (row.scheme_name, row.snapshot_version) == ("Renamed", "renamed")
+        backend.db.session.rollback()
+
+
+def test_upsert_for_each_dialect(backend):
+    statement = backend.upsert_insert(backend.Scheme, "postgresql")
+    sql = str(statement.on_conflict_do_update(index_elements=['ticker'], set_={"category": "x"})
+              .compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (ticker) DO UPDATE" in sql
+    with pytest.raises(RuntimeError):
+        backend.upsert_insert(backend.Scheme, "mysql")
+
+
+@pytest.mark.parametrize("uri, in_memory, pooled", [
+    ("sqlite://", True, False),
+    ("sqlite:///:memory:", True, False),
+    ("sqlite:////tmp/site.db", False, True),
+    ("postgresql://user@localhost/portfolio", False, False),
+])
+def test_engine_options(backend, uri, in_memory, pooled):
+    assert backend.in_memory_sqlite(uri) is in_memory
+    assert ("pool_size" in backend.engine_options(uri)) is pooled
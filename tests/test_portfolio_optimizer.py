@@ -0,0 +1,81 @@
+# tests/test_portfolio_optimizer.py
+import json
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_universe
+from portfolio_optimizer import project_capped_simplex, solve
+from scheme_snapshot import (SchemeSnapshot, content_version, whole_percents, write_allocation_model,
+                             write_schemes_file)
+
+
+def bisect_projection(v, cap):
+    # Reference: find the shift with sum(clip(v - shift, 0, cap)) == 1 by bisection
+    low, high = v.min() - 1, v.max()
+    for _ in range(200):
+        shift = (low + high) / 2
+        if np.clip(v - shift, 0, cap).sum() > 1:
+            low = shift
+        else:
+            high = shift
+    return np.clip(v - (low + high) / 2, 0, cap)
+
+
+def test_capped_simplex_known_point():
+    assert project_capped_simplex(np.array([0.9, 0.1, 0.0]), 0.5) == pytest.approx([0.5, 0.3, 0.2])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_capped_simplex_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    v = rng.normal(size=25) * 3
+    w = project_capped_simplex(v, 0.1)
+    assert w.sum() == pytest.approx(1.0)
+    assert w.min() >= 0 and w.max() <= 0.1 + 1e-12
+    assert w == pytest.approx(bisect_projection(v, 0.1), abs=1e-9)
+
+
+def test_solve_two_assets_closed_form():
+    mu = np.array([0.12, 0.06])
+    cov = np.array([[0.04, 0.006], [0.006, 0.01]])
+    risk_aversion = 5.0
+    # w1 maximizing mu.w - a/2 w'cov w on w1 + w2 = 1
+    expected = ((mu[0] - mu[1]) + risk_aversion * (cov[1, 1] - cov[0, 1])) / (
+        risk_aversion * (cov[0, 0] + cov[1, 1] - 2 * cov[0, 1]))
+    w = solve(mu, cov, risk_aversion, cap=1.0)
+    assert w == pytest.approx([expected, 1 - expected], abs=1e-6)
+
+
+def test_solve_respects_cap():
+    # Almost no risk aversion: fill the best schemes up to the cap
+    mu = np.array([0.1, 0.2, 0.3])
+    w = solve(mu, np.diag([1e-4, 1e-4, 1e-4]), 1e-3, cap=0.4)
+    assert w == pytest.approx([0.2, 0.4, 0.4], abs=1e-6)
+
+
+@pytest.mark.parametrize("weights", [[1, 1, 1], [0.5, 0.3, 0.2], [0.333, 0.333, 0.334, 1e-9], [0.07] * 15])
+def test_whole_percents_add_up_to_100(weights):
+    percents = whole_percents(weights)
+    assert sum(percents) == 100
+    assert all(abs(p - w / sum(weights) * 100) < 1 for p, w in zip(percents, weights))
+
+
+def test_allocation_sidecar_must_match_the_scheme_file(tmp_path):
+    path = str(tmp_path / "schemes.json")
+    schemes = make_universe(30, seed=2)
+    raw = json.dumps(schemes)
+    write_schemes_file(raw, path)
+    tickers = [s['ticker'] for s in schemes[:3]]
+    model = {"schemes_version": content_version(raw.encode()),
+             "profiles": {"Moderate": {"weights": dict(zip(tickers, (0.5, 0.3, 0.2)))}}}
+    write_allocation_model(model, path)
+    snapshot = SchemeSnapshot.from_file(path)
+    allocation, funds = snapshot.allocations["Moderate"]
+    assert [(f['ticker'], p) for f, p in funds] == list(zip(tickers, (50, 30, 20)))
+    assert sum(allocation.values()) == 100
+    # Weights for other scheme content are ignored - no plan, rule-based allocation instead
+    write_allocation_model(dict(model, schemes_version="0123456789ab"), path)
+    stale = SchemeSnapshot.from_file(path)
+    assert stale.allocations == {} and stale.allocation_model is None
+    assert stale.version != snapshot.version
@@ -0,0 +1,59 @@
+# tests/test_portfolios.py
+import pytest
+
+from conftest import user_headers
+
+
+def test_save_and_get_round_trip(client, auth, generated):
+    saved = client.post("/save_portfolio", json=dict(generated, profile_name="Mine"), headers=auth)
+    assert saved.status_code == 201
+    fetched = client.get(f"/portfolios/{saved.json['id']}", headers=auth).json
+    assert fetched["profile_name"] == "Mine"
+    assert fetched["profile"] == generated["profile"]
+    assert fetched["allocation"] == generated["allocation"]
+    assert fetched["schemes"] == generated["schemes"]
+
+
+def test_save_without_profile(backend, client, auth, generated):
+    # Older clients send {profile_name, allocation, schemes} only
+    body = {k: v for k, v in generated.items() if k != "profile"}
+    saved = client.post("/save_portfolio", json=body, headers=auth)
+    assert saved.status_code == 201
+    batch = client.post("/save_portfolios", json={"portfolios": [body, dict(body, profile=None)]}, headers=auth)
+    assert batch.status_code == 201
+    snapshot = backend.screener_agent.snapshot
+    for portfolio_id in [saved.json["id"]] + batch.json["ids"]:
+        fetched = client.get(f"/portfolios/{portfolio_id}", headers=auth).json
+        assert fetched["profile"] is None
+        assert fetched["allocation"] == generated["allocation"]
+        assert [{k: v for k, v in s.items() if k != "explanation"} for s in fetched["schemes"]] == \
+               [{k: v for k, v in s.items() if k != "explanation"} for s in generated["schemes"]]
+        # Profile-free reasons for the same funds
+        for scheme in fetched["schemes"]:
+            fund = snapshot.by_ticker[snapshot.ticker_by_name[scheme["scheme_name"]]]
+            assert scheme["explanation"] == backend.explainer_agent.run(fund, None)
+
+
+@pytest.mark.parametrize("change", [
+    {"percent": None}, {"percent": "abc"}, {"percent": -5}, {"percent": 1e9}, {"percent": [1]},
+])
+def test_bad_percent_is_400(client, auth, generated, change):
+    schemes = [dict(generated["schemes"][0], **change)] + generated["schemes"][1:]
+    response = client.post("/save_portfolio", json=dict(generated, schemes=schemes), headers=auth)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("body", [
+    {"profile": "Yolo"}, {"profile": ["Moderate"]}, {"schemes": [1]},
+    {"schemes": [{"scheme_name": "No Such Fund", "percent": 100}]},
+])
+def test_bad_portfolio_is_400(client, auth, generated, body):
+    assert client.post("/save_portfolio", json=dict(generated, **body), headers=auth).status_code == 400
+    assert client.post("/save_portfolios", json={"portfolios": [generated, 3]}, headers=auth).status_code == 400
+
+
+def test_other_users_portfolio_is_404(backend, client, auth, generated):
+    saved = client.post("/save_portfolio", json=generated, headers=auth).json["id"]
+    other = user_headers(backend)
+    assert client.get(f"/portfolios/{saved}", headers=other).status_code == 404
+    assert client.get("/portfolios", headers=other).json["portfolios"] == []
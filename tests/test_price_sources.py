@@ -0,0 +1,69 @@
+# tests/test_price_sources.py
+import logging
+
+import pandas as pd
+
+from price_sources import FilePriceSource, PriceSource, fetch_closes
+
+
+def closes(days, start="2024-01-01", first=100.0):
+    index = pd.bdate_range(start, periods=days)
+    return pd.Series([first + i for i in range(days)], index=index, dtype="float64")
+
+
+class FlakySource(PriceSource):
+    """Fails the first `failures[ticker]` calls for a ticker, then serves `data`."""
+    name = "flaky"
+
+    def __init__(self, data, failures=None):
+        self.data = data
+        self.failures = dict(failures or {})
+        self.calls = {}
+
+    def history(self, ticker, start=None, timeout=None):
+        self.calls[ticker] = self.calls.get(ticker, 0) + 1
+        if self.calls[ticker] <= self.failures.get(ticker, 0):
+            raise ConnectionError("boom")
+        series = self.data.get(ticker, pd.Series(dtype="float64"))
+        if start is not None:
+            series = series[series.index >= pd.Timestamp(start)]
+        return series
+
+
+def test_retries_until_success():
+    source = FlakySource({"A": closes(5)}, failures={"A": 2})
+    results, summary = fetch_closes(source, ["A"], retries=2, backoff=0)
+    assert list(results) == ["A"]
+    assert summary.fetched == ["A"]
+    assert summary.retries == 2
+    assert source.calls["A"] == 3
+
+
+def test_gives_up_after_retries():
+    source = FlakySource({"A": closes(5), "B": closes(5)}, failures={"B": 10})
+    results, summary = fetch_closes(source, ["A", "B"], retries=2, backoff=0)
+    assert list(results) == ["A"]
+    assert summary.failed == {"B": "ConnectionError: boom"}
+    assert source.calls["B"] == 3
+    assert summary.as_dict()["failed"] == {"B": "ConnectionError: boom"}
+
+
+def test_empty_vs_up_to_date(caplog):
+    source = FlakySource({"A": closes(5)})
+    with caplog.at_level(logging.INFO, logger="price_sources"):
+        # Incremental fetch with nothing new is not "no data"
+        _, summary = fetch_closes(source, ["A"], starts={"A": pd.Timestamp("2030-01-01").date()}, backoff=0)
+    assert summary.up_to_date == ["A"] and summary.empty == []
+    assert not [r for r in caplog.records if r.levelno >= logging.WARNING]
+
+    _, summary = fetch_closes(source, ["MISSING"], backoff=0)
+    assert summary.empty == ["MISSING"] and summary.up_to_date == []
+
+
+def test_file_price_source(tmp_path):
+    series = closes(10)
+    pd.DataFrame({"Date": series.index, "Close": series.values}).to_csv(tmp_path / "AAA.csv", index=False)
+    source = FilePriceSource(str(tmp_path))
+    assert source.history("AAA").tolist() == series.tolist()
+    assert source.history("AAA", start=series.index[7].date()).tolist() == series.tolist()[7:]
+    assert source.history("NOPE").empty
@@ -0,0 +1,64 @@
+# tests/test_price_store.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_preparation import update_price_store
+from price_sources import FilePriceSource
+from price_store import RECORD, PriceStore
+
+
+def closes(values, start="2024-01-01"):
+    return pd.Series(values, index=pd.bdate_range(start, periods=len(values)), dtype="float64")
+
+
+def write_csv(directory, ticker, series):
+    pd.DataFrame({"Date": series.index, "Close": series.values}).to_csv(directory / f"{ticker}.csv", index=False)
+
+
+def test_append_keeps_only_new_bars(tmp_path):
+    store = PriceStore(str(tmp_path))
+    series = closes([10.0, 11.0, 12.0, 13.0])
+    assert store.append("AAA", series[:3]) == 3
+    # Overlapping batch: only the bar after the last stored date goes in
+    assert store.append("AAA", series) == 1
+    assert store.append("AAA", series) == 0
+    assert store.closes("AAA").tolist() == [10.0, 11.0, 12.0, 13.0]
+    assert store.last_date("AAA") == series.index[-1].date()
+
+
+def test_torn_record_is_ignored_then_overwritten(tmp_path):
+    store = PriceStore(str(tmp_path))
+    series = closes([10.0, 11.0, 12.0])
+    store.append("AAA", series[:2])
+    # Interrupted append: half a record at the end of the file
+    with open(store.path_for("AAA"), "ab") as f:
+        f.write(b"\x01" * (RECORD.itemsize // 2))
+    assert len(store.history("AAA")) == 2
+    assert store.last_date("AAA") == series.index[1].date()
+
+    assert store.append("AAA", series) == 1
+    assert store.closes("AAA").tolist() == [10.0, 11.0, 12.0]
+    assert np.diff(store.rows("AAA")["date"]).min() > 0
+
+
+def test_readjusted_history_is_refetched(tmp_path):
+    prices, store_dir = tmp_path / "csv", tmp_path / "store"
+    prices.mkdir()
+    history = closes(np.linspace(100, 200, 60))
+    write_csv(prices, "AAA", history)
+    write_csv(prices, "BBB", history)
+    store, source = PriceStore(str(store_dir)), FilePriceSource(str(prices))
+    update_price_store(store, source, ["AAA", "BBB"], retries=0)
+
+    # 1:2 split on AAA: the source re-adjusts its whole history, then 5 new bars
+    more = closes([101.0] * 5, start=history.index[-1] + pd.offsets.BDay())
+    write_csv(prices, "AAA", pd.concat([history / 2, more]))
+    write_csv(prices, "BBB", pd.concat([history, more + 100]))
+    summary = update_price_store(store, source, ["AAA", "BBB"], retries=0)
+
+    split = store.closes("AAA")
+    assert len(split) == 65 and split[0] == 50.0
+    assert (np.diff(split) / split[:-1]).min() > -0.1 # no -50% step
+    assert store.closes("BBB").tolist() == pytest.approx(pd.concat([history, more + 100]).tolist())
+    assert not summary.failed
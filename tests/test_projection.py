@@ -0,0 +1,93 @@
+# tests/test_projection.py
+import pytest
+
+import portfolio_projection
+from benchmarks.synthetic import make_universe
+from portfolio_projection import MAX_PATHS, PortfolioProjector, check_budget, normalize_holdings
+from scheme_snapshot import SchemeSnapshot
+
+FD = {"scheme_name": "Bank FD", "category": "Fixed Deposit", "ticker": "FD", "risk_label": "Very Low",
+      "volatility": 0.0, "sharpe_ratio": 0.5, "avg_return": 0.07}
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    return SchemeSnapshot(make_universe(40, seed=6) + [FD], version="v1")
+
+
+def holdings(snapshot, start, count=4):
+    return [(t, 10 + i) for i, t in enumerate(list(snapshot.by_ticker)[start:start + count])]
+
+
+def test_riskless_holding_compounds_exactly(snapshot):
+    result = PortfolioProjector().project(snapshot, [("FD", 100)], years=5, paths=100, initial_amount=1000)
+    for band in result["percentiles"].values():
+        assert band == pytest.approx([1000 * 1.07 ** t for t in range(6)], abs=0.01)
+    assert result["expected_return"] == 0.07 and result["volatility"] == 0
+
+
+def test_chunking_does_not_change_results(snapshot, monkeypatch):
+    portfolios = [holdings(snapshot, i) for i in range(0, 30, 3)]
+    options = dict(years=6, paths=1500, seed=4)
+    whole = PortfolioProjector().project_many(snapshot, portfolios, **options)
+    single = PortfolioProjector().project(snapshot, portfolios[0], **options)
+    # Small path chunks and a few portfolios per pass - same draws, same bands
+    monkeypatch.setattr(portfolio_projection, "PATH_CHUNK", 128)
+    monkeypatch.setattr(portfolio_projection, "VALUES_BUDGET", 1500 * 7 * 3)
+    assert PortfolioProjector().project_many(snapshot, portfolios, **options) == whole
+    assert PortfolioProjector().project(snapshot, portfolios[0], **options) == single
+    # A batch of one draws over the same schemes as project()
+    assert PortfolioProjector().project_many(snapshot, portfolios[:1], **options) == [single]
+
+
+def test_results_are_cached(snapshot):
+    projector = PortfolioProjector()
+    assert projector.peek(snapshot, holdings(snapshot, 0), paths=100) is None
+    result = projector.project(snapshot, holdings(snapshot, 0), paths=100)
+    # Same holdings in another order are the same run
+    assert projector.peek(snapshot, holdings(snapshot, 0)[::-1], paths=100) is result
+
+
+@pytest.mark.parametrize("bad", [
+    [("FD", -1)], [("FD", float("nan"))], [("FD", "x")], [("FD", 0)], [],
+    [(f"T{i}", 1) for i in range(portfolio_projection.MAX_HOLDINGS + 1)],
+])
+def test_bad_holdings(bad):
+    with pytest.raises(ValueError):
+        normalize_holdings(bad)
+
+
+def test_budget():
+    check_budget(10, MAX_PATHS, portfolio_projection.MAX_DRAWS // (10 * MAX_PATHS))
+    with pytest.raises(ValueError):
+        check_budget(10, MAX_PATHS, portfolio_projection.MAX_DRAWS // (10 * MAX_PATHS) + 1)
+
+
+@pytest.mark.parametrize("options", [{"paths": MAX_PATHS + 1}, {"paths": 99}, {"years": 0}, {"years": "x"},
+                                     {"initial_amount": -5}])
+def test_bad_options_are_400(client, generated, options):
+    assert client.post("/project_portfolio", json=dict(generated, **options)).status_code == 400
+
+
+def test_project_generated_portfolio(client, generated):
+    response = client.post("/project_portfolio", json=dict(generated, years=3, paths=200, initial_amount=100))
+    assert response.status_code == 200
+    assert response.json["years"] == [0, 1, 2, 3]
+    assert response.json["percentiles"]["p50"][0] == 100
+
+
+def test_one_bad_saved_row_only_fails_itself(backend, client, auth, generated):
+    good = client.post("/save_portfolio", json=generated, headers=auth).json["id"]
+    bad = client.post("/save_portfolio", json=generated, headers=auth).json["id"]
+    with backend.app.app_context():
+        # Mixed signs, as rows saved before percents were validated could be
+        rows = backend.db.session.get(backend.Portfolio, bad).holdings
+        rows[0].percent, rows[1].percent = 150, -50
+        backend.db.session.commit()
+    response = client.post("/portfolios/projections", json={"ids": [good, bad], "paths": 200}, headers=auth)
+    assert response.status_code == 200
+    by_id = {p["id"]: p for p in response.json["projections"]}
+    assert "percentiles" in by_id[good]
+    assert "error" in by_id[bad]
+    single = client.get(f"/portfolios/{good}/projection", query_string={"paths": 200}, headers=auth).json
+    assert single["percentiles"] == by_id[good]["percentiles"]
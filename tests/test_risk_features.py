@@ -0,0 +1,54 @@
+# tests/test_risk_features.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_features import MIN_OBSERVATIONS, TRADING_DAYS, WINDOWS, align_closes, compute_risk_features
+
+
+def reference_features(closes, length):
+    # One ticker at a time with pandas, the way the labeling job used to do it
+    prices = closes.dropna()[-(length + 1):]
+    r = prices.pct_change().dropna()
+    if len(r) < MIN_OBSERVATIONS:
+        return dict.fromkeys(("volatility", "sharpe_ratio", "sortino_ratio", "downside_deviation",
+                              "max_drawdown", "avg_return"), np.nan)
+    std = r.std()
+    downside = np.sqrt((np.minimum(r, 0) ** 2).mean())
+    return {
+        "volatility": 0.001 if std == 0 else std * np.sqrt(TRADING_DAYS),
+        "sharpe_ratio": 0 if std == 0 else r.mean() / std * np.sqrt(TRADING_DAYS),
+        "sortino_ratio": 0 if downside == 0 else r.mean() / downside * np.sqrt(TRADING_DAYS),
+        "downside_deviation": downside * np.sqrt(TRADING_DAYS),
+        "max_drawdown": (prices / prices.cummax() - 1).min(),
+        "avg_return": r.mean() * TRADING_DAYS,
+    }
+
+
+@pytest.fixture
+def closes_by_ticker():
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range(end="2025-10-01", periods=1400)
+    closes = {}
+    for i, start in enumerate((0, 0, 300, 900, 1390)): # full, full, shorter, ~1y, too short
+        returns = rng.normal(0.0004, rng.uniform(0.005, 0.03), len(dates) - start)
+        closes[f"T{i}.NS"] = pd.Series(100 * np.exp(np.cumsum(returns)), index=dates[start:])
+    closes["FLAT.NS"] = pd.Series(10.0, index=dates)
+    return closes
+
+
+def test_matches_per_ticker_reference(closes_by_ticker):
+    features = compute_risk_features(*align_closes(closes_by_ticker))
+    for ticker, closes in closes_by_ticker.items():
+        for window, length in WINDOWS.items():
+            expected = reference_features(closes, length)
+            for name, value in expected.items():
+                assert features.loc[ticker, f"{name}_{window}"] == pytest.approx(value, nan_ok=True, rel=1e-9), \
+                    (ticker, window, name)
+
+
+def test_default_window_columns(closes_by_ticker):
+    features = compute_risk_features(*align_closes(closes_by_ticker))
+    assert features["volatility"].equals(features["volatility_3y"])
+    assert features.loc["FLAT.NS", "volatility"] == 0.001 and features.loc["FLAT.NS", "sharpe_ratio"] == 0
+    assert np.isnan(features.loc["T4.NS", "volatility"])
@@ -0,0 +1,70 @@
+# tests/test_risk_model.py
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_price_fixtures
+from data_preparation import AI_FEATURES, get_all_scheme_types, run_ai_labeling_job
+from price_sources import FilePriceSource
+from risk_model import RiskClusterModel
+
+
+@pytest.fixture
+def features():
+    rng = np.random.default_rng(5)
+    return pd.DataFrame({"volatility": rng.uniform(0.01, 0.4, 60), "sharpe_ratio": rng.normal(0.8, 0.5, 60)})
+
+
+def test_save_and_load_latest(tmp_path, features):
+    assert RiskClusterModel.load_latest(str(tmp_path)) is None
+    model = RiskClusterModel.fit(features, AI_FEATURES, version=9)
+    model.save(str(tmp_path))
+    newer = RiskClusterModel.fit(features, AI_FEATURES, version=10)
+    newer.save(str(tmp_path))
+    # v10 beats v9 - versions compare as numbers, not file names
+    loaded = RiskClusterModel.load_latest(str(tmp_path))
+    assert loaded.to_dict() == newer.to_dict()
+    assert list(loaded.predict(features)) == list(model.predict(features))
+    # Clusters are named by volatility: calmest rows are Low-M
+    labels = loaded.predict(features)
+    assert labels[features['volatility'].idxmin()] == "Low-M"
+    assert labels[features['volatility'].idxmax()] == "High-M"
+
+
+@pytest.fixture
+def prices_dir(tmp_path):
+    tickers = [s['ticker'] for s in get_all_scheme_types() if s['has_market_data']]
+    return write_price_fixtures(tickers, str(tmp_path / "prices"), years=4, seed=2)
+
+
+def run_job(tmp_path, prices_dir, **kwargs):
+    return json.loads(run_ai_labeling_job(FilePriceSource(prices_dir), store_dir=str(tmp_path / "store"),
+                                          model_dir=str(tmp_path / "models"), **kwargs))
+
+
+def saved_versions(tmp_path):
+    return sorted(os.listdir(tmp_path / "models"))
+
+
+def test_saved_model_is_reused(tmp_path, prices_dir):
+    first = run_job(tmp_path, prices_dir)
+    assert saved_versions(tmp_path) == ["risk_model_v1.json"]
+    assert run_job(tmp_path, prices_dir) == first
+    assert saved_versions(tmp_path) == ["risk_model_v1.json"]
+    run_job(tmp_path, prices_dir, refit=True)
+    assert saved_versions(tmp_path) == ["risk_model_v1.json", "risk_model_v2.json"]
+
+
+def test_model_with_other_features_is_refitted(tmp_path, prices_dir):
+    run_job(tmp_path, prices_dir)
+    path = tmp_path / "models" / "risk_model_v1.json"
+    stale = json.loads(path.read_text())
+    stale.update(features=["volatility"], scaler_mean=stale["scaler_mean"][:1],
+                 scaler_scale=stale["scaler_scale"][:1], centroids=[c[:1] for c in stale["centroids"]])
+    path.write_text(json.dumps(stale))
+    run_job(tmp_path, prices_dir)
+    assert saved_versions(tmp_path) == ["risk_model_v1.json", "risk_model_v2.json"]
+    assert RiskClusterModel.load_latest(str(tmp_path / "models")).features == AI_FEATURES
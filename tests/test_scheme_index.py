@@ -0,0 +1,36 @@
+# tests/test_scheme_index.py
+import numpy as np
+
+from benchmarks.synthetic import make_universe
+from fund_screener_agent import FundScreenerAgent
+from scheme_snapshot import PROFILE_RULES, SchemeSnapshot
+
+
+def filter_and_sort(schemes, profile, k=20):
+    # The screener before SchemeIndex: filter by label, full stable sort, top 20
+    labels, column, descending = PROFILE_RULES[profile]
+    default = 0 if column == "sharpe_ratio" else 1
+    shortlist = [s for s in schemes if s['risk_label'] in labels]
+    shortlist.sort(key=lambda s: s.get(column, default), reverse=descending)
+    return [s['ticker'] for s in shortlist[:k]]
+
+
+def test_shortlists_match_filter_and_sort():
+    schemes = make_universe(5000, seed=3)
+    for scheme in schemes[::2]:
+        # Plenty of ties at the cut-off
+        scheme['sharpe_ratio'] = round(scheme['sharpe_ratio'], 1)
+        scheme['volatility'] = round(scheme['volatility'], 2)
+    agent = FundScreenerAgent(snapshot=SchemeSnapshot(schemes))
+    for profile in PROFILE_RULES:
+        assert [s['ticker'] for s in agent.run(profile)] == filter_and_sort(schemes, profile)
+
+
+def test_small_universe_and_unknown_profile():
+    schemes = make_universe(30, seed=1)
+    snapshot = SchemeSnapshot(schemes)
+    agent = FundScreenerAgent(snapshot=snapshot)
+    for profile in PROFILE_RULES:
+        assert [s['ticker'] for s in agent.run(profile)] == filter_and_sort(schemes, profile)
+    assert agent.run("Nope") == []
+    assert np.all(snapshot.index.sharpe == [s['sharpe_ratio'] for s in schemes])
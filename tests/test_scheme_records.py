@@ -0,0 +1,62 @@
+# tests/test_scheme_records.py
+import copy
+
+import pytest
+
+from benchmarks.synthetic import make_universe
+from scheme_snapshot import PRIVATE_FUND_FIELDS, SchemeRecord, SchemeSnapshot
+
+SCHEMES = make_universe(50, seed=8) + [{"scheme_name": "Odd one", "category": "Hybrid Fund"}]
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    return SchemeSnapshot(copy.deepcopy(SCHEMES))
+
+
+def test_reads_like_the_source_dict(snapshot):
+    for record, source in zip(snapshot.schemes, SCHEMES):
+        assert isinstance(record, SchemeRecord)
+        assert record == source and dict(record) == source
+        assert list(record) == list(source) and len(record) == len(source)
+        assert record.get('avg_return') == source.get('avg_return')
+        assert ('avg_return' in record) == ('avg_return' in source)
+    odd = snapshot.schemes[-1]
+    with pytest.raises(KeyError):
+        odd['ticker']
+    assert repr(odd) == f"SchemeRecord({SCHEMES[-1]!r})"
+
+
+def test_cannot_be_changed(snapshot):
+    record = snapshot.schemes[0]
+    with pytest.raises(TypeError):
+        record['risk_label'] = "Low"
+    with pytest.raises(TypeError):
+        del record['risk_label']
+    with pytest.raises(AttributeError):
+        record.risk_label = "Low"
+    with pytest.raises(AttributeError):
+        record._row = 1
+    with pytest.raises(TypeError):
+        hash(record)
+    assert not hasattr(record, '__dict__')
+    assert record == SCHEMES[0]
+
+
+def test_public_view_is_a_fresh_dict(snapshot):
+    record = snapshot.schemes[0]
+    view = record.public_view(40, ["reason"])
+    expected = {k: v for k, v in SCHEMES[0].items() if k not in PRIVATE_FUND_FIELDS}
+    assert view == dict(expected, explanation=["reason"], percent=40)
+    assert list(view) == list(expected) + ['explanation', 'percent']
+    view['scheme_name'] = "changed"
+    assert record.public_view(40, [])['scheme_name'] == SCHEMES[0]['scheme_name']
+
+
+def test_shared_storage(snapshot):
+    table = snapshot.table
+    # One key tuple per distinct layout, one string per distinct category
+    assert len({id(layout) for layout in table.layouts}) == len(set(table.layouts)) <= 3
+    categories = table.columns['category']
+    assert len({id(c) for c in categories}) == len(set(categories))
+    assert table.column('avg_return')[-1] is None and table.column('ticker', '')[-1] == ''
@@ -0,0 +1,112 @@
+# tests/test_scheme_refresher.py
+import json
+import os
+import stat
+
+import pytest
+
+from benchmarks.synthetic import make_universe
+from fund_screener_agent import FundScreenerAgent
+from scheme_refresher import REFRESH_FAILURES, SchemeRefresher
+from scheme_snapshot import SchemeSnapshot, write_schemes_file
+
+
+def write_universe(path, seed):
+    write_schemes_file(json.dumps(make_universe(50, seed=seed)), path)
+    # Coarse filesystem clocks: make sure every write looks like a change
+    mtime = os.stat(path).st_mtime_ns + seed * 10**9
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def refresher(tmp_path):
+    path = str(tmp_path / "schemes.json")
+    write_universe(path, seed=1)
+    agent = FundScreenerAgent(snapshot=SchemeSnapshot.from_file(path))
+    return SchemeRefresher(agent, path=path, poll_seconds=0.01)
+
+
+def test_new_file_is_warmed_then_swapped(refresher):
+    agent = refresher.screener_agent
+    old = agent.snapshot
+    seen = []
+    # Preparers run before the swap; listeners after it
+    refresher.before_swap(lambda snapshot: seen.append(("before", snapshot, agent.snapshot)))
+    refresher.on_swap(lambda snapshot: seen.append(("after", snapshot, agent.snapshot)))
+
+    assert refresher.check_for_update() is False
+    write_universe(refresher.path, seed=2)
+    assert refresher.check_for_update() is True
+    new = agent.snapshot
+    assert new.version != old.version
+    assert seen == [("before", new, old), ("after", new, new)]
+    assert refresher.check_for_update() is False
+
+
+def test_same_content_is_not_swapped(refresher):
+    old = refresher.screener_agent.snapshot
+    with open(refresher.path) as f:
+        raw = f.read()
+    write_schemes_file(raw, refresher.path)
+    os.utime(refresher.path, ns=(1, 1))
+    assert refresher.check_for_update() is False
+    assert refresher.screener_agent.snapshot is old
+
+
+def test_bad_file_keeps_old_snapshot(refresher):
+    old = refresher.screener_agent.snapshot
+    write_schemes_file("[{not json", refresher.path)
+    with pytest.raises(ValueError):
+        refresher.check_for_update()
+    assert refresher.screener_agent.snapshot is old
+    # Fixed file is picked up on the next poll
+    write_universe(refresher.path, seed=3)
+    assert refresher.check_for_update() is True
+
+
+def test_failed_warm_up_is_retried(refresher):
+    old = refresher.screener_agent.snapshot
+    failures = [RuntimeError("warm-up failed")]
+
+    @refresher.before_swap
+    def flaky(snapshot):
+        if failures:
+            raise failures.pop()
+
+    write_universe(refresher.path, seed=2)
+    with pytest.raises(RuntimeError):
+        refresher.check_for_update()
+    assert refresher.screener_agent.snapshot is old
+    assert refresher.check_for_update() is True
+    assert refresher.screener_agent.snapshot is not old
+
+
+def test_loop_survives_failures(refresher, caplog):
+    write_schemes_file("[{not json", refresher.path)
+    failures = REFRESH_FAILURES.value()
+
+    def logged():
+        return [r for r in caplog.records if r.name == "scheme_refresher" and r.levelname == "ERROR"]
+
+    refresher.start()
+    try:
+        for _ in range(500):
+            if logged():
+                break
+            refresher._stop.wait(0.01)
+        assert logged() and logged()[0].exc_info # logged with the traceback
+        assert refresher.last_error and REFRESH_FAILURES.value() > failures
+        assert refresher._thread.is_alive()
+    finally:
+        refresher.stop(timeout=1)
+
+
+def test_atomic_write_keeps_file_mode(tmp_path):
+    path = str(tmp_path / "schemes.json")
+    write_schemes_file("[]", path)
+    umask = os.umask(0)
+    os.umask(umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~umask
+    os.chmod(path, 0o640)
+    write_schemes_file("[1]", path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
@@ -1,5 +1,25 @@
 # user_profile_agent.py
+import itertools
+
+# run() only ever compares against these values - anything else behaves like None
+QUIZ_ANSWERS = ("A", "B", "C")
+HORIZONS = ("7+ Years",)
+
 class UserProfileAgent:
+    # Every distinct (Quiz_Answer_1, Quiz_Answer_2, horizon) that run() can tell apart
+    QUIZ_SPACE = tuple(itertools.product(QUIZ_ANSWERS + (None,), QUIZ_ANSWERS + (None,), HORIZONS + (None,)))
+
+    def normalize(self, user_details):
+        """Collapse a quiz payload to its key in QUIZ_SPACE."""
+        q1 = user_details.get("Quiz_Answer_1")
+        q2 = user_details.get("Quiz_Answer_2")
+        horizon = user_details.get("horizon")
+        return (
+            q1 if q1 in QUIZ_ANSWERS else None,
+            q2 if q2 in QUIZ_ANSWERS else None,
+            horizon if horizon in HORIZONS else None,
+        )
+
     def run(self, user_details):
         q1 = user_details.get("Quiz_Answer_1") # Market drop reaction
         q2 = user_details.get("Quiz_Answer_2") # Primary goal
@@ -23,4 +43,4 @@ class UserProfileAgent:
                  return "Conservative" # Be safer for shorter term
 
         # Default fallback
-        return "Moderate"
\ No newline at end of file
+        return "Moderate"